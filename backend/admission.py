@@ -0,0 +1,133 @@
+"""
+Admission control for the Flask endpoints.
+Each route group (generation, enrichment, send) gets a fixed number of
+concurrent slots and a short wait queue with a deadline. When the queue is
+full, or a request can't get a slot before its deadline, it's rejected right
+away with a Retry-After hint instead of piling up behind upstream APIs.
+"""
+
+import math
+import os
+import threading
+import time
+
+# group -> (max concurrent, max queued, max seconds to wait in the queue)
+DEFAULT_LIMITS = {
+    "generation": (4, 8, 10.0),
+    "enrichment": (4, 16, 5.0),
+    "send": (2, 16, 10.0),
+}
+
+EWMA_ALPHA = 0.2  # weight of the newest sample in the service time average
+
+
+def _limits(group):
+    """Limits for a group, overridable with COLDSEND_ADMIT_<GROUP>=concurrency,queue,timeout."""
+    concurrency, queue, timeout = DEFAULT_LIMITS.get(group, (4, 8, 10.0))
+    override = os.getenv(f"COLDSEND_ADMIT_{group.upper()}")
+    if override:
+        parts = [p.strip() for p in override.split(",")]
+        concurrency = int(parts[0]) if len(parts) > 0 and parts[0] else concurrency
+        queue = int(parts[1]) if len(parts) > 1 and parts[1] else queue
+        timeout = float(parts[2]) if len(parts) > 2 and parts[2] else timeout
+    return concurrency, queue, timeout
+
+
+class Gate:
+    """Bounded concurrency plus a bounded, deadline-limited wait queue."""
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.service_time = None  # EWMA seconds per admitted request
+        self.counters = {"admitted": 0, "queued": 0, "rejected_full": 0, "rejected_timeout": 0}
+        self.wait_total = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """
+        Take a slot, waiting in the queue if needed.
+        Returns None when admitted, otherwise the rejection reason.
+        """
+        with self._cond:
+            if self.active < self.max_concurrent and not self.waiting:
+                self.active += 1
+                self.counters["admitted"] += 1
+                return None
+            if self.waiting >= self.max_queue:
+                self.counters["rejected_full"] += 1
+                return "queue_full"
+
+            self.waiting += 1
+            self.counters["queued"] += 1
+            start = time.monotonic()
+            deadline = start + self.queue_timeout
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counters["rejected_timeout"] += 1
+                        return "queue_timeout"
+                    self._cond.wait(remaining)
+                self.active += 1
+                self.counters["admitted"] += 1
+                self.wait_total += time.monotonic() - start
+                return None
+            finally:
+                self.waiting -= 1
+
+    def release(self, elapsed=None):
+        with self._cond:
+            self.active -= 1
+            if elapsed is not None:
+                if self.service_time is None:
+                    self.service_time = elapsed
+                else:
+                    self.service_time += EWMA_ALPHA * (elapsed - self.service_time)
+            self._cond.notify()
+
+    def retry_after(self):
+        """Whole seconds until a slot is likely free: the queue ahead drained at the observed rate."""
+        with self._cond:
+            service_time = self.service_time or self.queue_timeout
+            backlog = (self.waiting + 1) / self.max_concurrent
+            return max(1, math.ceil(service_time * backlog))
+
+    def stats(self):
+        with self._cond:
+            queued = self.counters["queued"] - self.counters["rejected_timeout"]
+            return dict(
+                self.counters,
+                active=self.active,
+                queue_depth=self.waiting,
+                max_concurrent=self.max_concurrent,
+                max_queue=self.max_queue,
+                queue_timeout=self.queue_timeout,
+                avg_service_seconds=round(self.service_time, 3) if self.service_time is not None else None,
+                avg_queue_wait_seconds=round(self.wait_total / queued, 3) if queued > 0 else None,
+            )
+
+
+_gates = {}
+_lock = threading.Lock()
+
+
+def get_gate(group):
+    """Get the gate for a route group, creating it from env/default limits on first use."""
+    with _lock:
+        gate = _gates.get(group)
+        if gate is None:
+            gate = _gates[group] = Gate(group, *_limits(group))
+        return gate
+
+
+def get_admission_stats():
+    for group in DEFAULT_LIMITS:
+        get_gate(group)
+    with _lock:
+        gates = list(_gates.values())
+    return {gate.name: gate.stats() for gate in gates}
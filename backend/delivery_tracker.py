@@ -0,0 +1,402 @@
+"""
+Delivery-status tracking through Microsoft Graph change notifications.
+Outgoing messages are tagged with an X-ColdSend-Id header. Graph notifies
+/graph/notifications when messages land in Sent Items or the Inbox; sent items
+are matched by that header, and bounces/replies by conversation. Outcomes are
+written back to the job row in the sheet in batches.
+"""
+
+import os
+import queue
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+GRAPH_URL = "https://graph.microsoft.com/v1.0"
+TRACKING_HEADER = "X-ColdSend-Id"
+TRACKING_DB = os.getenv("COLDSEND_HISTORY_DB", "coldsend_history.db")
+
+# Graph caps mail subscriptions at just under 3 days
+SUBSCRIPTION_MINUTES = 4200
+RENEW_BEFORE = timedelta(hours=12)
+
+WATCHED_FOLDERS = {
+    "sent": "me/mailFolders('SentItems')/messages",
+    "inbox": "me/mailFolders('Inbox')/messages",
+}
+
+SHEET_FLUSH_SIZE = 20
+SHEET_FLUSH_INTERVAL = 30  # seconds
+
+BOUNCE_SENDERS = ("postmaster@", "mailer-daemon@", "microsoftexchange")
+BOUNCE_SUBJECTS = ("undeliverable:", "delivery status notification", "mail delivery failed", "returned mail")
+
+
+def _header(message, name):
+    for header in message.get("internetMessageHeaders") or []:
+        if header.get("name", "").lower() == name.lower():
+            return header.get("value")
+    return None
+
+
+def _is_bounce(message):
+    sender = ((message.get("from") or {}).get("emailAddress") or {}).get("address", "").lower()
+    subject = (message.get("subject") or "").lower()
+    return sender.startswith(BOUNCE_SENDERS) or subject.startswith(BOUNCE_SUBJECTS)
+
+
+class GraphMessageSource:
+    """Fetches messages and manages subscriptions against the real Graph API."""
+
+    def __init__(self, get_token, refresh_token):
+        self.get_token = get_token
+        self.refresh_token = refresh_token
+        self.session = requests.Session()
+
+    def _request(self, method, url, **kwargs):
+        token = self.get_token()
+        res = self.session.request(method, url, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+        if res.status_code == 401:
+            token = self.refresh_token()
+            if token:
+                res = self.session.request(method, url, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+        return res
+
+    def get_message(self, resource):
+        res = self._request(
+            "GET",
+            f"{GRAPH_URL}/{resource}",
+            params={"$select": "subject,from,toRecipients,conversationId,internetMessageId,internetMessageHeaders"},
+        )
+        if res.status_code != 200:
+            print(f"Failed to fetch {resource}: {res.status_code} {res.text}")
+            return None
+        return res.json()
+
+    def create_subscription(self, resource, notification_url, client_state, expires):
+        res = self._request("POST", f"{GRAPH_URL}/subscriptions", json={
+            "changeType": "created",
+            "notificationUrl": notification_url,
+            "resource": resource,
+            "expirationDateTime": expires,
+            "clientState": client_state,
+        })
+        return res.json() if res.status_code == 201 else None
+
+    def renew_subscription(self, subscription_id, expires):
+        res = self._request("PATCH", f"{GRAPH_URL}/subscriptions/{subscription_id}",
+                            json={"expirationDateTime": expires})
+        return res.status_code == 200
+
+
+class FakeGraph:
+    """
+    In-memory stand-in for Graph, for tests and local runs.
+    Holds messages by resource path and delivers notifications straight to a tracker.
+    """
+
+    def __init__(self):
+        self.messages = {}
+        self.subscriptions = {}
+
+    def get_message(self, resource):
+        return self.messages.get(resource)
+
+    def create_subscription(self, resource, notification_url, client_state, expires):
+        subscription_id = str(uuid.uuid4())
+        self.subscriptions[subscription_id] = {"resource": resource, "clientState": client_state}
+        return {"id": subscription_id, "expirationDateTime": expires}
+
+    def renew_subscription(self, subscription_id, expires):
+        return subscription_id in self.subscriptions
+
+    def _deliver(self, tracker, folder, message, client_state=None):
+        message.setdefault("id", str(uuid.uuid4()))
+        resource = f"{WATCHED_FOLDERS[folder]}/{message['id']}"
+        self.messages[resource] = message
+        subscription_id, subscription = next(
+            (sid, s) for sid, s in self.subscriptions.items() if s["resource"] == WATCHED_FOLDERS[folder]
+        )
+        return tracker.handle_notifications({"value": [{
+            "subscriptionId": subscription_id,
+            "clientState": client_state or subscription["clientState"],
+            "changeType": "created",
+            "resource": resource,
+        }]}, sync=True)
+
+    def send(self, tracker, tracking_id, conversation_id, internet_message_id=None, client_state=None):
+        """Simulate a tagged message showing up in Sent Items."""
+        return self._deliver(tracker, "sent", {
+            "conversationId": conversation_id,
+            "internetMessageId": internet_message_id or f"<{uuid.uuid4()}@fake>",
+            "internetMessageHeaders": [{"name": TRACKING_HEADER, "value": tracking_id}],
+        }, client_state)
+
+    def reply(self, tracker, conversation_id, sender="someone@example.com"):
+        return self._deliver(tracker, "inbox", {
+            "conversationId": conversation_id,
+            "subject": "RE: hello",
+            "from": {"emailAddress": {"address": sender}},
+        })
+
+    def bounce(self, tracker, conversation_id):
+        return self._deliver(tracker, "inbox", {
+            "conversationId": conversation_id,
+            "subject": "Undeliverable: hello",
+            "from": {"emailAddress": {"address": "postmaster@example.com"}},
+        })
+
+
+class DeliveryTracker:
+    """Tracks tagged messages and turns Graph notifications into job-row updates."""
+
+    def __init__(self, source, path=TRACKING_DB, sheet_writer=None):
+        self.source = source
+        self.sheet_writer = sheet_writer or _write_sheet_notes
+        # Only used for new subscriptions - each stored subscription keeps its own
+        self.client_state = os.getenv("GRAPH_CLIENT_STATE") or secrets.token_urlsafe(16)
+        self.subscriptions = {}  # subscription id -> {"resource", "expires", "client_state"}
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS tracked_messages (
+                tracking_id TEXT PRIMARY KEY,
+                recipient TEXT,
+                job_row INTEGER,
+                conversation_id TEXT,
+                internet_message_id TEXT,
+                status TEXT,
+                updated_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS tracked_conversation ON tracked_messages (conversation_id);
+            CREATE TABLE IF NOT EXISTS graph_subscriptions (
+                subscription_id TEXT PRIMARY KEY,
+                resource TEXT,
+                expires REAL,
+                client_state TEXT
+            );
+        """)
+        self._load_subscriptions()
+
+        self._queue = queue.Queue()
+        self._pending_notes = {}  # job row -> [note, ...]
+        self._last_flush = time.monotonic()
+        self._worker = None
+
+    def _load_subscriptions(self):
+        """Pick up subscriptions made by earlier processes, so restarts don't drop notifications."""
+        now = time.time()
+        rows = self._db.execute(
+            "SELECT subscription_id, resource, expires, client_state FROM graph_subscriptions WHERE expires > ?", (now,)
+        ).fetchall()
+        for subscription_id, resource, expires, client_state in rows:
+            self.subscriptions[subscription_id] = {
+                "resource": resource,
+                "expires": datetime.fromtimestamp(expires, timezone.utc),
+                "client_state": client_state,
+            }
+        self._db.execute("DELETE FROM graph_subscriptions WHERE expires <= ?", (now,))
+        self._db.commit()
+
+    def _save_subscription(self, subscription_id, sub):
+        self._update(
+            "INSERT OR REPLACE INTO graph_subscriptions (subscription_id, resource, expires, client_state) "
+            "VALUES (?, ?, ?, ?)",
+            (subscription_id, sub["resource"], sub["expires"].timestamp(), sub["client_state"])
+        )
+
+    # --- outgoing ---
+
+    def tag(self, headers, recipient, job_row=None):
+        """Add a tracking header to an outgoing email's headers and remember it."""
+        tracking_id = str(uuid.uuid4())
+        headers[TRACKING_HEADER] = tracking_id
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO tracked_messages (tracking_id, recipient, job_row, status, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (tracking_id, recipient, job_row, "queued", time.time())
+            )
+            self._db.commit()
+        return tracking_id
+
+    def mark_failed(self, tracking_id):
+        """The tagged message was never sent - don't leave it queued forever."""
+        self._update("UPDATE tracked_messages SET status = 'failed', updated_at = ? WHERE tracking_id = ?",
+                     (time.time(), tracking_id))
+
+    def get_status(self, tracking_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT recipient, job_row, status FROM tracked_messages WHERE tracking_id = ?", (tracking_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"recipient": row[0], "jobRow": row[1], "status": row[2]}
+
+    # --- subscriptions ---
+
+    def subscribe(self, notification_url):
+        """Subscribe to new messages in Sent Items and the Inbox."""
+        expires = datetime.now(timezone.utc) + timedelta(minutes=SUBSCRIPTION_MINUTES)
+        created = []
+        for resource in WATCHED_FOLDERS.values():
+            sub = self.source.create_subscription(
+                resource, notification_url, self.client_state, expires.strftime("%Y-%m-%dT%H:%M:%SZ")
+            )
+            if sub:
+                self.subscriptions[sub["id"]] = {"resource": resource, "expires": expires, "client_state": self.client_state}
+                self._save_subscription(sub["id"], self.subscriptions[sub["id"]])
+                created.append(sub["id"])
+        return created
+
+    def renew_if_needed(self):
+        """Extend subscriptions that are about to expire. Cheap when nothing is due."""
+        now = datetime.now(timezone.utc)
+        for subscription_id, sub in list(self.subscriptions.items()):
+            if sub["expires"] - now > RENEW_BEFORE:
+                continue
+            expires = now + timedelta(minutes=SUBSCRIPTION_MINUTES)
+            if self.source.renew_subscription(subscription_id, expires.strftime("%Y-%m-%dT%H:%M:%SZ")):
+                sub["expires"] = expires
+                self._save_subscription(subscription_id, sub)
+            else:
+                print(f"Failed to renew Graph subscription {subscription_id}")
+                self.subscriptions.pop(subscription_id)
+                self._update("DELETE FROM graph_subscriptions WHERE subscription_id = ?", (subscription_id,))
+
+    # --- incoming ---
+
+    def handle_notifications(self, payload, sync=False):
+        """
+        Accept a Graph notification payload. Messages are fetched and matched on a
+        background worker so the webhook can answer Graph immediately. With sync
+        (FakeGraph, tests) they're processed and flushed before returning.
+        """
+        accepted = 0
+        for notification in payload.get("value", []):
+            sub = self.subscriptions.get(notification.get("subscriptionId"))
+            if sub is None:
+                continue
+            if notification.get("clientState") != sub["client_state"]:
+                print("Ignoring Graph notification with bad clientState")
+                continue
+            folder = "sent" if sub["resource"] == WATCHED_FOLDERS["sent"] else "inbox"
+            if sync:
+                self._process(folder, notification["resource"])
+            else:
+                self._queue.put((folder, notification["resource"]))
+            accepted += 1
+
+        if sync:
+            self.flush()
+        elif accepted:
+            self._ensure_worker()
+        return accepted
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, daemon=True, name="delivery-tracker")
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            try:
+                folder, resource = self._queue.get(timeout=SHEET_FLUSH_INTERVAL)
+                self._process(folder, resource)
+            except queue.Empty:
+                pass
+            except Exception as e:
+                print(f"Error processing Graph notification: {e}")
+            if (sum(len(n) for n in self._pending_notes.values()) >= SHEET_FLUSH_SIZE
+                    or time.monotonic() - self._last_flush >= SHEET_FLUSH_INTERVAL):
+                self.flush()
+
+    def _process(self, folder, resource):
+        message = self.source.get_message(resource)
+        if not message:
+            return
+
+        if folder == "sent":
+            tracking_id = _header(message, TRACKING_HEADER)
+            if tracking_id:
+                self._update(
+                    "UPDATE tracked_messages SET status = 'sent', conversation_id = ?, internet_message_id = ?, "
+                    "updated_at = ? WHERE tracking_id = ?",
+                    (message.get("conversationId"), message.get("internetMessageId"), time.time(), tracking_id)
+                )
+            return
+
+        conversation_id = message.get("conversationId")
+        if not conversation_id:
+            return
+        with self._lock:
+            row = self._db.execute(
+                "SELECT tracking_id, recipient, job_row, status FROM tracked_messages WHERE conversation_id = ?",
+                (conversation_id,)
+            ).fetchone()
+        if row is None:
+            return
+
+        tracking_id, recipient, job_row, status = row
+        new_status = "bounced" if _is_bounce(message) else "replied"
+        if status == new_status:
+            return
+        self._update("UPDATE tracked_messages SET status = ?, updated_at = ? WHERE tracking_id = ?",
+                     (new_status, time.time(), tracking_id))
+        print(f"{recipient}: {new_status}")
+
+        if new_status == "bounced":
+            import suppression
+            suppression.get_index().suppress(email=recipient, reason="bounced")
+        if job_row:
+            with self._lock:
+                self._pending_notes.setdefault(job_row, []).append(f"{new_status}: {recipient}")
+
+    def _update(self, query, params):
+        with self._lock:
+            self._db.execute(query, params)
+            self._db.commit()
+
+    def flush(self):
+        """Write queued outcomes to the sheet in one batch."""
+        with self._lock:
+            notes, self._pending_notes = self._pending_notes, {}
+            self._last_flush = time.monotonic()
+        if not notes:
+            return
+        try:
+            self.sheet_writer(notes)
+        except Exception as e:
+            print(f"Failed to write delivery updates to sheet: {e}")
+            with self._lock:
+                for row, row_notes in notes.items():
+                    self._pending_notes.setdefault(row, [])[:0] = row_notes
+
+
+def _write_sheet_notes(notes):
+    """Default sheet writer: append notes to job rows through sheets_integ."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+    import sheets_integ
+    sheets_integ.append_notes(notes)
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker(get_token=None, refresh_token=None):
+    """Get the shared tracker, backed by the real Graph API."""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = DeliveryTracker(GraphMessageSource(get_token, refresh_token))
+        return _tracker
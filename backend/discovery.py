@@ -0,0 +1,319 @@
+"""
+Company people discovery.
+Takes a job (company + job title) and finds people at that company worth
+emailing through Apollo's people search: paged, filtered by titles/seniorities
+drawn from the job title, deduplicated against earlier dead ends and the
+send history, ranked, capped, then enriched with emails in bulk_match batches.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import requests
+
+import recorder
+import scheduler
+import suppression
+
+APOLLO_BASE = "https://api.apollo.io/api/v1"
+DISCOVERY_DB = os.getenv("COLDSEND_DISCOVERY_DB", suppression.HISTORY_DB)
+# Extra titles to search for on every job, e.g. "engineering manager,cto"
+EXTRA_TITLES = [t.strip() for t in os.getenv("COLDSEND_DISCOVERY_TITLES", "").split(",") if t.strip()]
+
+PER_PAGE = 100  # Apollo's max
+MAX_PAGES = 5
+POOL_FACTOR = 3  # rank a pool this many times bigger than we need
+ENRICH_BATCH = 10  # bulk_match limit
+REQUEST_TIMEOUT = 30
+
+RECRUITER_TITLES = ["recruiter", "technical recruiter", "talent acquisition"]
+
+# Words that describe the level of a role rather than the role itself
+LEVEL_WORDS = {
+    "senior", "sr", "junior", "jr", "intern", "internship", "lead", "staff", "principal",
+    "associate", "entry", "level", "new", "grad", "graduate", "i", "ii", "iii", "iv",
+    "summer", "fall", "spring", "winter", "co", "op", "coop", "remote", "hybrid", "and", "the",
+}
+EARLY_CAREER_WORDS = {"intern", "internship", "junior", "jr", "entry", "new", "grad", "graduate", "co", "op", "coop"}
+
+# Apollo seniority values, weighted by how useful a contact at that level is
+SENIORITY_WEIGHTS = {
+    "manager": 2.0, "director": 1.5, "head": 1.5, "senior": 1.0, "vp": 1.0,
+    "entry": 0.5, "c_suite": 0.5, "founder": 0.5, "owner": 0.25, "partner": 0.25, "intern": 0.0,
+}
+
+
+def _tokens(text):
+    return re.findall(r"[a-z0-9+#]+", (text or "").lower())
+
+
+def core_role(job_title):
+    """The role part of a job title: 'Senior Software Engineer II (Remote)' -> 'software engineer'."""
+    title = re.sub(r"\(.*?\)", " ", job_title or "")
+    title = re.split(r"\s[-|–,]\s|,", title)[0]
+    return " ".join(t for t in _tokens(title) if t not in LEVEL_WORDS and not t.isdigit())
+
+
+def search_filters(job_title):
+    """Apollo people search title/seniority filters for a job title."""
+    role = core_role(job_title)
+    titles = ([role] if role else []) + RECRUITER_TITLES + EXTRA_TITLES
+
+    # Early-career roles: reach the people one level up who'd mentor/hire.
+    # Experienced roles: go straight to managers and up.
+    if EARLY_CAREER_WORDS & set(_tokens(job_title)):
+        seniorities = ["entry", "senior", "manager", "director"]
+    else:
+        seniorities = ["senior", "manager", "director", "head", "vp"]
+
+    return {"person_titles": titles, "person_seniorities": seniorities}
+
+
+def score_candidate(person, role_tokens):
+    """Higher is better. Title match counts most, then seniority."""
+    title_tokens = set(_tokens(person.get("title")))
+    score = 0.0
+    if role_tokens:
+        score += 3.0 * len(role_tokens & title_tokens) / len(role_tokens)
+    if title_tokens & {"recruiter", "recruiting", "talent"}:
+        score += 1.5
+    score += SENIORITY_WEIGHTS.get(person.get("seniority"), 0.5)
+    return score
+
+
+def rank_candidates(people, job_title):
+    """Sort candidates best-first. Ties keep Apollo's order."""
+    role_tokens = set(_tokens(core_role(job_title)))
+    return sorted(people, key=lambda p: -score_candidate(p, role_tokens))
+
+
+def person_to_lead(person):
+    """Convert an Apollo person to the lead shape the pipeline uses."""
+    organization = person.get("organization") or {}
+    experiences = [
+        f"{job.get('title')} at {job.get('organization_name')}"
+        for job in person.get("employment_history") or []
+        if job.get("title")
+    ]
+    location = ", ".join(filter(None, [person.get("city"), person.get("state"), person.get("country")]))
+    return {
+        "linkedinUrl": person.get("linkedin_url"),
+        "name": person.get("name") or " ".join(filter(None, [person.get("first_name"), person.get("last_name")])),
+        "headline": person.get("headline") or person.get("title"),
+        "experiences": experiences,
+        "email": person.get("email"),
+        "company": organization.get("name"),
+        "location": location,
+        "state": person.get("state"),
+        "country": person.get("country"),
+        "timezone": scheduler.infer_timezone(person.get("time_zone"), person),
+    }
+
+
+def _person_key(person):
+    return suppression.normalize_linkedin_url(person.get("linkedin_url")) or person.get("id")
+
+
+class DiscoveryLog:
+    """Remembers dead-end people per company (no usable email), and resolved Apollo org ids."""
+
+    def __init__(self, path=DISCOVERY_DB):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS discovered (
+                company TEXT,
+                person TEXT,
+                job_row INTEGER,
+                discovered_at REAL,
+                PRIMARY KEY (company, person)
+            );
+            CREATE TABLE IF NOT EXISTS organizations (
+                company TEXT PRIMARY KEY,
+                org_id TEXT,
+                domain TEXT
+            );
+        """)
+
+    def seen(self, company):
+        with self._lock:
+            rows = self._db.execute("SELECT person FROM discovered WHERE company = ?", (company,))
+            return {person for (person,) in rows}
+
+    def record(self, company, people, job_row=None):
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO discovered (company, person, job_row, discovered_at) VALUES (?, ?, ?, ?)",
+                [(company, person, job_row, now) for person in people]
+            )
+            self._db.commit()
+
+    def get_org(self, company):
+        with self._lock:
+            return self._db.execute("SELECT org_id, domain FROM organizations WHERE company = ?", (company,)).fetchone()
+
+    def set_org(self, company, org_id, domain):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO organizations VALUES (?, ?, ?)", (company, org_id, domain))
+            self._db.commit()
+
+
+def normalize_company_url(url):
+    """Reduce a LinkedIn company URL to its /company/<slug> path."""
+    url = (url or "").strip().lower().split("?", 1)[0].split("#", 1)[0].rstrip("/")
+    marker = url.find("linkedin.com/company/")
+    if marker != -1:
+        return "/".join(url[marker + len("linkedin.com"):].split("/")[:3])
+    return url
+
+
+class Discoverer:
+    """Finds and enriches people at a job's company through Apollo."""
+
+    def __init__(self, api_key, log=None, index=None, remember=True):
+        self.api_key = api_key
+        self.remember = remember  # False for dry runs: record no dead ends
+        self.log = log or DiscoveryLog()
+        self.index = index or suppression.get_index()
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "Cache-Control": "no-cache",
+            "x-api-key": api_key
+        })
+
+    def _post(self, path, payload):
+        for attempt in range(2):
+            response = recorder.call(
+                f"apollo.{path.replace('/', '.')}",
+                {"path": path, "payload": payload},
+                lambda: self.session.post(f"{APOLLO_BASE}/{path}", json=payload, timeout=REQUEST_TIMEOUT),
+                encode=recorder.encode_http_response,
+                decode=recorder.decode_http_response,
+            )
+            if response.status_code == 429 and not attempt:
+                # Rate limited - wait as long as Apollo asks (within reason) and retry once
+                time.sleep(min(float(response.headers.get("Retry-After") or 5), 30))
+                continue
+            response.raise_for_status()
+            return response.json()
+
+    def resolve_organization(self, company_name, company_linkedin_url):
+        """Apollo organization id for a company, matched on its LinkedIn URL. Cached."""
+        company = normalize_company_url(company_linkedin_url) or (company_name or "").lower()
+        cached = self.log.get_org(company)
+        if cached:
+            return cached[0]
+
+        result = self._post("mixed_companies/search", {
+            "q_organization_name": company_name,
+            "page": 1,
+            "per_page": 10
+        })
+        organizations = (result.get("organizations") or []) + (result.get("accounts") or [])
+        if not organizations:
+            return None
+        # Prefer the exact LinkedIn match; name search can return lookalikes
+        match = next((o for o in organizations
+                      if company and normalize_company_url(o.get("linkedin_url")) == company), None)
+        if match is None:
+            if company_linkedin_url:
+                print(f"No Apollo organization matches {company_linkedin_url}, using closest name match")
+            match = organizations[0]
+        org_id = match.get("organization_id") or match.get("id")
+        self.log.set_org(company, org_id, match.get("primary_domain"))
+        return org_id
+
+    def search(self, org_id, job_title, want):
+        """
+        Page through people search until there's a big enough pool to rank
+        (want * POOL_FACTOR), or results run out.
+        """
+        filters = search_filters(job_title)
+        pool_size = want * POOL_FACTOR
+        people = []
+        page = 1
+        while len(people) < pool_size and page <= MAX_PAGES:
+            result = self._post("mixed_people/search", {
+                "organization_ids": [org_id],
+                **filters,
+                "page": page,
+                "per_page": min(PER_PAGE, max(25, pool_size))
+            })
+            batch = result.get("people") or []
+            people.extend(batch)
+            total_pages = (result.get("pagination") or {}).get("total_pages") or 0
+            if not batch or page >= total_pages:
+                break
+            page += 1
+        return people
+
+    def candidates(self, job, want):
+        """Ranked, deduplicated candidates for a job (at most want * POOL_FACTOR)."""
+        org_id = self.resolve_organization(job.company_name, job.company_linkedin_url)
+        if not org_id:
+            return []
+
+        company = normalize_company_url(job.company_linkedin_url) or job.company_name.lower()
+        seen = self.log.seen(company)
+        unique = []
+        for person in self.search(org_id, job.job_title, want):
+            key = _person_key(person)
+            if not person.get("linkedin_url") or key in seen:
+                continue
+            seen.add(key)
+            if self.index.check(linkedin_url=person["linkedin_url"]):
+                continue
+            unique.append(person)
+        return rank_candidates(unique, job.job_title)
+
+    def enrich(self, people):
+        """Reveal emails for up to ENRICH_BATCH people in one bulk_match call."""
+        result = self._post("people/bulk_match", {
+            "details": [{"id": p.get("id"), "linkedin_url": p.get("linkedin_url")} for p in people],
+            "reveal_personal_emails": True
+        })
+        return [m for m in result.get("matches") or [] if m]
+
+    def discover(self, job):
+        """
+        Discover leads for a job, yielding them in enriched batches. Stops once
+        max_emails - emails_sent leads with emails have been handed out.
+        People who turned out to have no usable email are recorded so later runs
+        skip them. Leads that are handed out aren't: once sent to, the send
+        history excludes them, and if the send failed a later run should find
+        them again.
+        """
+        want = max(0, job.max_emails - job.emails_sent)
+        if not want:
+            return
+
+        ranked = self.candidates(job, want)
+        company = normalize_company_url(job.company_linkedin_url) or job.company_name.lower()
+        found = 0
+        start = 0
+        while start < len(ranked) and found < want:
+            batch = ranked[start:start + min(ENRICH_BATCH, want - found)]
+            start += len(batch)
+            leads = []
+            for person in self.enrich(batch):
+                lead = person_to_lead(person)
+                if not lead["email"] or not lead["linkedinUrl"]:
+                    continue
+                if self.index.check(email=lead["email"], linkedin_url=lead["linkedinUrl"]):
+                    continue
+                lead["jobRow"] = job.row_number
+                leads.append(lead)
+
+            if self.remember:
+                handed_out = {suppression.normalize_linkedin_url(lead["linkedinUrl"]) for lead in leads}
+                dead_ends = [key for key in map(_person_key, batch) if key not in handed_out]
+                self.log.record(company, dead_ends, job.row_number)
+
+            found += len(leads)
+            if leads:
+                yield leads
@@ -0,0 +1,39 @@
+"""
+Lazy module loading for fast startup.
+lazy_import("name") returns a stand-in that imports the real module the first
+time one of its attributes is used, after running an optional hook (e.g. to
+load .env before a module reads its settings).
+"""
+
+import importlib
+import threading
+
+
+class LazyModule:
+    """Module stand-in that imports on first attribute access."""
+
+    def __init__(self, name, before_import=None):
+        self._name = name
+        self._before_import = before_import
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    if self._before_import:
+                        self._before_import()
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name, before_import=None):
+    return LazyModule(name, before_import)
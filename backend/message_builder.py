@@ -0,0 +1,205 @@
+"""
+Pre-built message fragments.
+The signature (often with inline base64 images) and the resume attachment are
+the bulk of every message, but they only change when the user changes them.
+They're sanitized (and optionally minified) and serialized once per version
+here, and each send just splices the small per-recipient parts around them.
+
+    SIGNATURE_SANITIZE=true   strip scripts, event handlers and javascript: links
+    SIGNATURE_MINIFY=false    drop comments and collapse whitespace runs in text
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from email.message import MIMEPart
+
+CACHE_SIZE = 8
+SANITIZE_SIGNATURE = os.getenv("SIGNATURE_SANITIZE", "true").lower() == "true"
+MINIFY_SIGNATURE = os.getenv("SIGNATURE_MINIFY", "false").lower() == "true"
+
+CONTENT_TYPES = {
+    'pdf': 'application/pdf',
+    'doc': 'application/msword',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+}
+
+HTML_PREFIX = "<html><body>"
+HTML_SUFFIX = "</body></html>"
+BODY_SEPARATOR = "<br><br>"
+
+_SCRIPT_RE = re.compile(r"<(script|iframe|object|embed)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_EVENT_ATTR_RE = re.compile(r"\s+on[a-z]+\s*=\s*(\"[^\"]*\"|'[^']*'|[^\s>]+)", re.IGNORECASE)
+_JS_URL_RE = re.compile(r"(href|src)\s*=\s*([\"'])\s*javascript:[^\"']*\2", re.IGNORECASE)
+_COMMENT_RE = re.compile(r"<!--(?!\[if).*?-->", re.DOTALL)
+_TAG_RE = re.compile(r"(<[^>]*>)")
+_PREFORMATTED_RE = re.compile(r"<(/?)(pre|textarea)\b", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"[ \t\r\n]+")
+
+
+@dataclass
+class PreparedSignature:
+    version: str
+    html: str  # cleaned per SIGNATURE_SANITIZE / SIGNATURE_MINIFY
+    json_fragment: bytes  # html already escaped for the inside of a JSON string
+
+
+@dataclass
+class PreparedAttachment:
+    name: str
+    content_type: str
+    data: bytes
+    graph_json: bytes  # complete Graph fileAttachment object
+    mime_part: MIMEPart  # ready-encoded MIME part
+
+
+def _json_fragment(text):
+    """JSON-escape text for splicing inside an existing JSON string."""
+    return json.dumps(text, ensure_ascii=False)[1:-1].encode("utf-8")
+
+
+def sanitize_html(html):
+    """Strip active content (scripts, event handlers, javascript: links)."""
+    html = _SCRIPT_RE.sub("", html)
+    html = _EVENT_ATTR_RE.sub("", html)
+    return _JS_URL_RE.sub(r'\1=\2#\2', html)
+
+
+def minify_html(html):
+    """
+    Drop comments and collapse whitespace runs in text to a single space.
+    Tags (and so attribute values) and <pre>/<textarea> contents are left
+    alone, and whitespace between elements is kept, so rendering doesn't change.
+    """
+    html = _COMMENT_RE.sub("", html)
+    parts = _TAG_RE.split(html)
+    preformatted = 0
+    for i, part in enumerate(parts):
+        if i % 2:  # a tag
+            match = _PREFORMATTED_RE.match(part)
+            if match:
+                preformatted = max(0, preformatted + (-1 if match.group(1) else 1))
+        elif not preformatted:
+            parts[i] = _WHITESPACE_RE.sub(" ", part)
+    return "".join(parts).strip()
+
+
+def clean_signature_html(html):
+    """Apply the configured signature cleanup (sanitize and/or minify)."""
+    if SANITIZE_SIGNATURE:
+        html = sanitize_html(html)
+    if MINIFY_SIGNATURE:
+        html = minify_html(html)
+    return html
+
+
+class _LRU:
+    def __init__(self, size):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.items[key] = value
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+
+_signatures = _LRU(CACHE_SIZE)
+_attachments = _LRU(CACHE_SIZE)
+
+
+def prepare_signature(signature_html):
+    """Get the prepared version of a signature, building it once per version."""
+    version = hashlib.sha1((signature_html or "").encode("utf-8")).hexdigest()
+    prepared = _signatures.get(version)
+    if prepared is None:
+        html = clean_signature_html(signature_html or "")
+        prepared = PreparedSignature(version, html, _json_fragment(html))
+        _signatures.put(version, prepared)
+    return prepared
+
+
+def prepare_attachment(path):
+    """
+    Read, encode and serialize a file attachment once per file version
+    (path + mtime + size). Returns None if the file doesn't exist.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    prepared = _attachments.get(key)
+    if prepared is not None:
+        return prepared
+
+    with open(path, "rb") as f:
+        data = f.read()
+    name = os.path.basename(path)
+    content_type = CONTENT_TYPES.get(name.lower().split('.')[-1], 'application/octet-stream')
+
+    graph_json = json.dumps({
+        "@odata.type": "#microsoft.graph.fileAttachment",
+        "name": name,
+        "contentType": content_type,
+        "contentBytes": base64.b64encode(data).decode("ascii")
+    }).encode("utf-8")
+
+    maintype, _, subtype = content_type.partition("/")
+    mime_part = MIMEPart()
+    mime_part.set_content(data, maintype=maintype, subtype=subtype, disposition="attachment", filename=name)
+
+    prepared = PreparedAttachment(name, content_type, data, graph_json, mime_part)
+    _attachments.put(key, prepared)
+    return prepared
+
+
+def render_html(body_html, signature):
+    """Full HTML document for a body + prepared signature."""
+    return f"{HTML_PREFIX}{body_html}{BODY_SEPARATOR}{signature.html}{HTML_SUFFIX}"
+
+
+def graph_payload(email):
+    """
+    Serialize a Graph sendMail payload to bytes by splicing pre-serialized
+    fragments. Only the per-recipient fields get JSON-encoded here.
+    """
+    dumps = json.dumps
+    parts = [b'{"message":{"subject":', dumps(email.subject).encode("utf-8"),
+             b',"body":{"contentType":"HTML","content":"']
+
+    if email.signature is not None and email.body_html is not None:
+        parts += [_json_fragment(HTML_PREFIX + email.body_html + BODY_SEPARATOR),
+                  email.signature.json_fragment,
+                  _json_fragment(HTML_SUFFIX)]
+    else:
+        parts.append(_json_fragment(email.html))
+
+    parts += [b'"},"toRecipients":[{"emailAddress":{"address":', dumps(email.to).encode("utf-8"), b'}}]']
+
+    if email.send_at:
+        parts += [b',"singleValueExtendedProperties":[{"id":"SystemTime 0x3FEF","value":',
+                  dumps(email.send_at).encode("utf-8"), b'}]']  # PidTagDeferredSendTime
+    if email.headers:
+        headers = [{"name": name, "value": value} for name, value in email.headers.items()]
+        parts += [b',"internetMessageHeaders":', dumps(headers).encode("utf-8")]
+    if email.attachments:
+        parts += [b',"attachments":[', b",".join(a.graph_json for a in email.attachments), b']']
+
+    parts.append(b'},"saveToSentItems":"true"}')
+    return b"".join(parts)
@@ -0,0 +1,239 @@
+"""
+Model routing for the generation endpoints.
+Maps each task to a tier of models with a fallback chain, optional hedged
+requests, and per-model latency/cost tracking.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import anthropic
+
+import recorder
+
+SONNET = "claude-sonnet-4-20250514"
+HAIKU = "claude-3-5-haiku-20241022"
+
+# Default routes per task. "models" is the fallback chain (first = primary),
+# "hedge_model" is fired if the primary hasn't answered after "hedge_after" seconds.
+DEFAULT_ROUTES = {
+    "email": {
+        "models": [SONNET, HAIKU],
+        "hedge_model": HAIKU,
+        "hedge_after": 6.0,
+        "timeout": 20.0,
+    },
+    # The user is waiting on a regenerate click: fast model first, Sonnet as fallback
+    "regenerate": {
+        "models": [HAIKU, SONNET],
+        "hedge_model": None,
+        "hedge_after": None,
+        "timeout": 15.0,
+    },
+    "connection_note": {
+        "models": [HAIKU, SONNET],
+        "hedge_model": None,
+        "hedge_after": None,
+        "timeout": 10.0,
+    },
+}
+
+# USD per million tokens (input, output)
+MODEL_PRICING = {
+    SONNET: (3.00, 15.00),
+    HAIKU: (0.80, 4.00),
+}
+
+# Status codes worth falling back on (overloaded / transient server errors)
+RETRYABLE_STATUS = {500, 503, 529}
+
+_clients = {}
+_clients_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="model-router")
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_route(task):
+    """
+    Get the route for a task, with env overrides applied.
+    COLDSEND_MODELS_<TASK>=model1,model2  overrides the fallback chain
+    COLDSEND_HEDGE_<TASK>=model:seconds    overrides the hedge ("off" disables)
+    """
+    if task not in DEFAULT_ROUTES:
+        raise ValueError(f"Unknown generation task: {task}")
+
+    route = dict(DEFAULT_ROUTES[task])
+    key = task.upper()
+
+    models = os.getenv(f"COLDSEND_MODELS_{key}")
+    if models:
+        route["models"] = [m.strip() for m in models.split(",") if m.strip()]
+        if not route["models"]:
+            raise ValueError(f"COLDSEND_MODELS_{key}={models!r} names no models")
+
+    hedge = os.getenv(f"COLDSEND_HEDGE_{key}")
+    if hedge:
+        if hedge.lower() == "off":
+            route["hedge_model"] = None
+            route["hedge_after"] = None
+        else:
+            model, _, seconds = hedge.partition(":")
+            route["hedge_model"] = model.strip()
+            route["hedge_after"] = float(seconds or route["hedge_after"] or 5.0)
+
+    return route
+
+
+def _get_client(api_key):
+    """Get a cached Anthropic client for this API key (reuses connections)."""
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            # Retries are handled by the fallback chain, not the SDK
+            client = anthropic.Anthropic(api_key=api_key, max_retries=0)
+            _clients[api_key] = client
+        return client
+
+
+def _is_retryable(error):
+    """Whether an error should move us on to the next model in the chain."""
+    if isinstance(error, (anthropic.APITimeoutError, anthropic.APIConnectionError)):
+        return True
+    if isinstance(error, anthropic.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS
+    if isinstance(error, recorder.ReplayedError):
+        return error.status_code in RETRYABLE_STATUS or error.type in ("APITimeoutError", "APIConnectionError")
+    return False
+
+
+def _record(model, latency, response=None, error=None):
+    """Record latency, token usage and cost for a model call."""
+    with _stats_lock:
+        stats = _stats.setdefault(model, {
+            "calls": 0,
+            "errors": 0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cost_usd": 0.0,
+            "latencies": deque(maxlen=500),
+        })
+        stats["calls"] += 1
+        if error is not None:
+            stats["errors"] += 1
+            return
+        stats["latencies"].append(latency)
+
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            input_tokens = usage.input_tokens or 0
+            output_tokens = usage.output_tokens or 0
+            stats["input_tokens"] += input_tokens
+            stats["output_tokens"] += output_tokens
+            in_price, out_price = MODEL_PRICING.get(model, (0.0, 0.0))
+            stats["cost_usd"] += (input_tokens * in_price + output_tokens * out_price) / 1_000_000
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def get_model_stats():
+    """Get a snapshot of per-model latency and cost stats."""
+    with _stats_lock:
+        snapshot = {}
+        for model, stats in _stats.items():
+            latencies = list(stats["latencies"])
+            snapshot[model] = {
+                "calls": stats["calls"],
+                "errors": stats["errors"],
+                "input_tokens": stats["input_tokens"],
+                "output_tokens": stats["output_tokens"],
+                "cost_usd": round(stats["cost_usd"], 6),
+                "p50_latency": _percentile(latencies, 50),
+                "p95_latency": _percentile(latencies, 95),
+            }
+        return snapshot
+
+
+def _call_model(api_key, model, messages, max_tokens, timeout):
+    """Make a single messages.create call and record its latency/cost."""
+    client = _get_client(api_key)
+    start = time.perf_counter()
+    try:
+        response = recorder.call(
+            "anthropic.messages",
+            {"model": model, "max_tokens": max_tokens, "messages": messages},
+            lambda: client.messages.create(
+                model=model,
+                max_tokens=max_tokens,
+                messages=messages,
+                timeout=timeout,
+            ),
+            encode=lambda r: r.model_dump(),
+            decode=anthropic.types.Message.model_validate,
+        )
+    except Exception as e:
+        _record(model, time.perf_counter() - start, error=e)
+        raise
+    latency = time.perf_counter() - start
+    _record(model, latency, response=response)
+    print(f"Model {model} answered in {latency:.2f}s")
+    return response
+
+
+def _hedged_call(api_key, model, hedge_model, hedge_after, messages, max_tokens, timeout):
+    """
+    Call the primary model, and if it hasn't answered after hedge_after seconds,
+    also fire the hedge model. Returns whichever succeeds first.
+    """
+    primary = _executor.submit(_call_model, api_key, model, messages, max_tokens, timeout)
+    done, _ = wait([primary], timeout=hedge_after)
+    if done:
+        return primary.result()
+
+    print(f"{model} slower than {hedge_after}s, hedging with {hedge_model}")
+    hedge = _executor.submit(_call_model, api_key, hedge_model, messages, max_tokens, timeout)
+    pending = {primary, hedge}
+    last_error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                return future.result()
+            except Exception as e:
+                last_error = e
+    raise last_error
+
+
+def create_message(api_key, task, messages, max_tokens):
+    """
+    Generate a response for a task, walking the task's fallback chain on
+    overload (529) and timeout errors. Returns the Anthropic message.
+    """
+    route = get_route(task)
+    hedge_model = route.get("hedge_model")
+    hedge_after = route.get("hedge_after")
+    timeout = route.get("timeout")
+
+    last_error = None
+    for i, model in enumerate(route["models"]):
+        try:
+            if i == 0 and hedge_model and hedge_after and hedge_model != model:
+                return _hedged_call(api_key, model, hedge_model, hedge_after, messages, max_tokens, timeout)
+            return _call_model(api_key, model, messages, max_tokens, timeout)
+        except Exception as e:
+            if not _is_retryable(e):
+                raise
+            print(f"Model {model} failed for {task} ({e}), falling back")
+            last_error = e
+
+    raise last_error
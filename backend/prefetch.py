@@ -0,0 +1,96 @@
+"""
+Speculative pre-generation store.
+Work started by /prefetch is kept here (keyed by profile URL + settings hash)
+for a short TTL, so the later /generate-email and /query-apollo calls can
+return straight away instead of doing the full round trip.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from suppression import normalize_linkedin_url
+
+PREFETCH_TTL = float(os.getenv("PREFETCH_TTL", "300"))  # seconds
+PREFETCH_WASTE_BUDGET = int(os.getenv("PREFETCH_WASTE_BUDGET", "20"))  # unused prefetches per hour
+PREFETCH_MAX_IN_FLIGHT = int(os.getenv("PREFETCH_MAX_IN_FLIGHT", "4"))
+WASTE_WINDOW = 3600
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_MAX_IN_FLIGHT, thread_name_prefix="prefetch")
+_entries = {}  # (kind, key) -> {"future": Future, "created": float}
+_wasted = deque()  # timestamps of prefetches that expired unused
+_lock = threading.Lock()
+_counters = {"started": 0, "hits": 0, "wasted": 0, "rejected": 0}
+
+
+def settings_hash(*parts):
+    """Stable short hash of the settings/preferences that shape the output."""
+    blob = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
+
+def make_key(profile_url, *settings):
+    return f"{normalize_linkedin_url(profile_url)}|{settings_hash(*settings)}"
+
+
+def _expire_locked(now):
+    """Drop expired entries, counting never-used ones against the waste budget."""
+    for entry_key in [k for k, e in _entries.items() if now - e["created"] > PREFETCH_TTL]:
+        _entries.pop(entry_key)
+        _wasted.append(now)
+        _counters["wasted"] += 1
+    while _wasted and now - _wasted[0] > WASTE_WINDOW:
+        _wasted.popleft()
+
+
+def start(kind, key, fn, *args):
+    """
+    Start fn(*args) in the background and store it under (kind, key).
+    Returns False if it's already prefetched or the budget is exhausted.
+    """
+    now = time.monotonic()
+    with _lock:
+        _expire_locked(now)
+        if (kind, key) in _entries:
+            return False
+
+        in_flight = sum(1 for e in _entries.values() if not e["future"].done())
+        if len(_wasted) >= PREFETCH_WASTE_BUDGET or in_flight >= PREFETCH_MAX_IN_FLIGHT:
+            _counters["rejected"] += 1
+            return False
+
+        _entries[(kind, key)] = {"future": _executor.submit(fn, *args), "created": now}
+        _counters["started"] += 1
+        return True
+
+
+def take(kind, key, timeout=60):
+    """
+    Pop a prefetched result. Waits for it if it's still running.
+    Returns None if there's nothing usable (missing, expired or failed).
+    """
+    with _lock:
+        _expire_locked(time.monotonic())
+        entry = _entries.pop((kind, key), None)
+    if entry is None:
+        return None
+
+    try:
+        result = entry["future"].result(timeout=timeout)
+    except Exception as e:
+        print(f"Prefetched {kind} failed, generating fresh: {e}")
+        return None
+
+    with _lock:
+        _counters["hits"] += 1
+    return result
+
+
+def get_prefetch_stats():
+    with _lock:
+        _expire_locked(time.monotonic())
+        return dict(_counters, stored=len(_entries), wasted_last_hour=len(_wasted))
@@ -0,0 +1,244 @@
+"""
+Record and replay upstream calls (Anthropic, Apollo, Graph).
+
+    COLDSEND_RECORD=calls.jsonl.gz     append every upstream call to a gzip JSONL log
+    COLDSEND_REPLAY=calls.jsonl.gz     serve recorded responses instead of calling out
+    COLDSEND_REPLAY_LATENCY=1.0        replay latency multiplier (0 = instant)
+
+Recordings are redacted: API keys and tokens are dropped, email addresses and
+LinkedIn slugs become stable pseudonyms, attachments are reduced to their size,
+and request prompts/bodies to a length + hash. Responses keep their text so the
+code under test still has something real to parse.
+
+In replay mode a call is matched on its (redacted) request first; if there's
+no exact match, the next recording of the same kind is used, so a recording
+of real traffic can drive a benchmark with different inputs.
+"""
+
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+
+RECORD_PATH = os.getenv("COLDSEND_RECORD")
+REPLAY_PATH = os.getenv("COLDSEND_REPLAY")
+REPLAY_LATENCY = float(os.getenv("COLDSEND_REPLAY_LATENCY", "1.0"))
+
+FLUSH_EVERY = 50  # records per gzip member (gzip compresses better in bigger chunks)
+
+SECRET_KEYS = {
+    "x-api-key", "api_key", "apikey", "authorization", "access_token", "refresh_token",
+    "client_secret", "password", "token",
+}
+BLOB_KEYS = {"contentBytes"}
+# Free text in requests (prompts, email bodies) - kept only as length + hash
+TEXT_KEYS = {"content", "text"}
+
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_LINKEDIN_RE = re.compile(r"(linkedin\.com/in/)([^/?#\"\s]+)", re.IGNORECASE)
+
+
+def _digest(text, size=10):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:size]
+
+
+def _pseudonymize(text):
+    text = _EMAIL_RE.sub(lambda m: f"user-{_digest(m.group(0).lower())}@example.invalid", text)
+    return _LINKEDIN_RE.sub(lambda m: f"{m.group(1)}p-{_digest(m.group(2).lower())}", text)
+
+
+def redact(value, summarize_text=False, key=None):
+    """Redacted copy of a JSON-like value."""
+    if isinstance(value, dict):
+        return {k: redact(v, summarize_text, k) for k, v in value.items()}
+    if isinstance(value, list):
+        return [redact(v, summarize_text, key) for v in value]
+    if isinstance(value, str):
+        if key and key.lower() in SECRET_KEYS:
+            return "<redacted>"
+        if key in BLOB_KEYS:
+            return f"<{len(value)} chars>"
+        if summarize_text and key in TEXT_KEYS:
+            return f"<text len={len(value)} sha={_digest(value)}>"
+        return _pseudonymize(value)
+    return value
+
+
+def request_key(kind, request):
+    """Stable key for matching a (redacted) request at replay time."""
+    return _digest(kind + json.dumps(request, sort_keys=True, default=str), 16)
+
+
+class ReplayedError(Exception):
+    """An upstream error, as recorded."""
+
+    def __init__(self, kind, error):
+        super().__init__(error.get("message", ""))
+        self.kind = kind
+        self.type = error.get("type")
+        self.status_code = error.get("status")
+
+
+class RecordedResponse:
+    """Stand-in for a requests.Response during replay."""
+
+    def __init__(self, status_code, body=None, text=""):
+        self.status_code = status_code
+        self._body = body
+        self.text = text if body is None else json.dumps(body)
+        self.headers = {}
+
+    def json(self):
+        return self._body if self._body is not None else json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise ReplayedError("http", {"type": "HTTPError", "status": self.status_code, "message": self.text})
+
+
+def encode_http_response(response):
+    try:
+        return {"status": response.status_code, "body": response.json()}
+    except ValueError:
+        return {"status": response.status_code, "text": response.text}
+
+
+def decode_http_response(data):
+    return RecordedResponse(data["status"], data.get("body"), data.get("text", ""))
+
+
+class Recorder:
+    """
+    Appends redacted call records to a gzip JSONL file. Every FLUSH_EVERY
+    records the current gzip member is finished and a new one started, so a
+    process that dies without running atexit loses at most that many records.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "at", encoding="utf-8")
+        self._pending = 0
+        atexit.register(self.close)
+
+    def write(self, record):
+        line = json.dumps(record, separators=(",", ":"), default=str)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self._pending += 1
+            if self._pending >= FLUSH_EVERY:
+                self._file.close()
+                self._file = gzip.open(self.path, "at", encoding="utf-8")
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class Replayer:
+    """Serves recorded responses, by exact request first, then round-robin per kind."""
+
+    def __init__(self, path, latency_scale=1.0):
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._by_key = defaultdict(deque)
+        self._by_kind = defaultdict(list)
+        self._next = defaultdict(int)
+        self.counters = {"exact": 0, "approximate": 0}
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    # A partial last line means the recording process died mid-write
+                    if line.strip() and line.endswith("\n"):
+                        record = json.loads(line)
+                        self._by_key[record["key"]].append(record)
+                        self._by_kind[record["kind"]].append(record)
+            except EOFError:
+                # The last gzip member was never finished; keep everything before it
+                print(f"{path} ends in a truncated gzip member, replaying the complete records only")
+        print(f"Replaying {sum(len(v) for v in self._by_kind.values())} recorded calls from {path}")
+
+    def lookup(self, kind, key):
+        with self._lock:
+            matches = self._by_key.get(key)
+            if matches:
+                # Cycle through repeats of the same request in recorded order
+                record = matches[0]
+                matches.rotate(-1)
+                self.counters["exact"] += 1
+                return record
+            records = self._by_kind.get(kind)
+            if not records:
+                raise LookupError(f"No recorded calls of kind {kind!r} to replay")
+            record = records[self._next[kind] % len(records)]
+            self._next[kind] += 1
+            self.counters["approximate"] += 1
+            return record
+
+
+_recorder = Recorder(RECORD_PATH) if RECORD_PATH and not REPLAY_PATH else None
+_replayer = Replayer(REPLAY_PATH, REPLAY_LATENCY) if REPLAY_PATH else None
+
+
+def call(kind, request, fn, encode=None, decode=None):
+    """
+    Run an upstream call through the recorder.
+
+    kind    -- call type, e.g. "anthropic.messages" or "apollo.people.match"
+    request -- JSON-able description of the request (or a function building it,
+               so nothing is built when recording is off)
+    fn      -- makes the real call
+    encode  -- response -> JSON-able (for recording)
+    decode  -- JSON-able -> response (for replay)
+    """
+    if _recorder is None and _replayer is None:
+        return fn()
+
+    request = redact(request() if callable(request) else request, summarize_text=True)
+    key = request_key(kind, request)
+
+    if _replayer is not None:
+        record = _replayer.lookup(kind, key)
+        if _replayer.latency_scale:
+            time.sleep(record["elapsed"] * _replayer.latency_scale)
+        if record.get("error"):
+            raise ReplayedError(kind, record["error"])
+        response = record["response"]
+        return decode(response) if decode else response
+
+    start = time.perf_counter()
+    try:
+        response = fn()
+    except Exception as e:
+        _recorder.write({
+            "kind": kind, "key": key, "ts": time.time(), "elapsed": time.perf_counter() - start,
+            "request": request,
+            "error": {"type": type(e).__name__, "status": getattr(e, "status_code", None), "message": _pseudonymize(str(e))},
+        })
+        raise
+    elapsed = time.perf_counter() - start
+    _recorder.write({
+        "kind": kind, "key": key, "ts": time.time(), "elapsed": elapsed,
+        "request": request,
+        "response": redact(encode(response) if encode else response),
+    })
+    return response
+
+
+def get_recorder_stats():
+    if _replayer is not None:
+        return {"mode": "replay", "path": REPLAY_PATH, "latency_scale": REPLAY_LATENCY, **_replayer.counters}
+    if _recorder is not None:
+        return {"mode": "record", "path": RECORD_PATH}
+    return {"mode": "off"}
@@ -0,0 +1,307 @@
+"""
+Deferred-send scheduling.
+Picks a send time for each recipient inside a business-hours window in their
+own time zone, spreads sends across the window with jitter, skips weekends and
+holidays, and respects a per-mailbox hourly cap.
+"""
+
+import os
+import random
+import sqlite3
+import threading
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_RECIPIENT_TIMEZONE", "America/Chicago")
+WINDOW_START = time.fromisoformat(os.getenv("SEND_WINDOW_START", "09:00"))
+WINDOW_END = time.fromisoformat(os.getenv("SEND_WINDOW_END", "11:30"))
+MAILBOX_HOURLY_CAP = int(os.getenv("MAILBOX_HOURLY_CAP", "30"))
+if MAILBOX_HOURLY_CAP < 1:
+    raise ValueError(f"MAILBOX_HOURLY_CAP={MAILBOX_HOURLY_CAP} must be at least 1")
+# Extra non-working days, e.g. "2026-12-24,2026-12-31"
+EXTRA_HOLIDAYS = os.getenv("COLDSEND_HOLIDAYS", "")
+
+BOOKINGS_DB = os.getenv("COLDSEND_HISTORY_DB", "coldsend_history.db")
+
+CALENDAR_YEARS = 3  # how far ahead the business-day calendar is precomputed
+
+UTC = ZoneInfo("UTC")
+
+US_STATE_TIMEZONES = {
+    "alabama": "America/Chicago", "alaska": "America/Anchorage", "arizona": "America/Phoenix",
+    "arkansas": "America/Chicago", "california": "America/Los_Angeles", "colorado": "America/Denver",
+    "connecticut": "America/New_York", "delaware": "America/New_York", "district of columbia": "America/New_York",
+    "florida": "America/New_York", "georgia": "America/New_York", "hawaii": "Pacific/Honolulu",
+    "idaho": "America/Boise", "illinois": "America/Chicago", "indiana": "America/Indiana/Indianapolis",
+    "iowa": "America/Chicago", "kansas": "America/Chicago", "kentucky": "America/New_York",
+    "louisiana": "America/Chicago", "maine": "America/New_York", "maryland": "America/New_York",
+    "massachusetts": "America/New_York", "michigan": "America/Detroit", "minnesota": "America/Chicago",
+    "mississippi": "America/Chicago", "missouri": "America/Chicago", "montana": "America/Denver",
+    "nebraska": "America/Chicago", "nevada": "America/Los_Angeles", "new hampshire": "America/New_York",
+    "new jersey": "America/New_York", "new mexico": "America/Denver", "new york": "America/New_York",
+    "north carolina": "America/New_York", "north dakota": "America/Chicago", "ohio": "America/New_York",
+    "oklahoma": "America/Chicago", "oregon": "America/Los_Angeles", "pennsylvania": "America/New_York",
+    "rhode island": "America/New_York", "south carolina": "America/New_York", "south dakota": "America/Chicago",
+    "tennessee": "America/Chicago", "texas": "America/Chicago", "utah": "America/Denver",
+    "vermont": "America/New_York", "virginia": "America/New_York", "washington": "America/Los_Angeles",
+    "west virginia": "America/New_York", "wisconsin": "America/Chicago", "wyoming": "America/Denver",
+}
+
+COUNTRY_TIMEZONES = {
+    "united kingdom": "Europe/London", "ireland": "Europe/Dublin", "germany": "Europe/Berlin",
+    "france": "Europe/Paris", "netherlands": "Europe/Amsterdam", "spain": "Europe/Madrid",
+    "italy": "Europe/Rome", "switzerland": "Europe/Zurich", "sweden": "Europe/Stockholm",
+    "poland": "Europe/Warsaw", "israel": "Asia/Jerusalem", "india": "Asia/Kolkata",
+    "singapore": "Asia/Singapore", "japan": "Asia/Tokyo", "china": "Asia/Shanghai",
+    "hong kong": "Asia/Hong_Kong", "south korea": "Asia/Seoul", "australia": "Australia/Sydney",
+    "new zealand": "Pacific/Auckland", "canada": "America/Toronto", "mexico": "America/Mexico_City",
+    "brazil": "America/Sao_Paulo", "united arab emirates": "Asia/Dubai",
+}
+
+
+def _nth_weekday(year, month, weekday, n):
+    """The nth (1-based) weekday of a month; n=-1 for the last one."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + (month == 12), month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(day):
+    """Fixed-date holidays on a weekend are observed on the nearest weekday."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def us_holidays(year):
+    """US federal holidays (observed dates) for a year."""
+    return {
+        _observed(date(year, 1, 1)),
+        _nth_weekday(year, 1, 0, 3),    # MLK Day
+        _nth_weekday(year, 2, 0, 3),    # Presidents' Day
+        _nth_weekday(year, 5, 0, -1),   # Memorial Day
+        _observed(date(year, 6, 19)),   # Juneteenth
+        _observed(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),    # Labor Day
+        _nth_weekday(year, 10, 0, 2),   # Columbus Day
+        _observed(date(year, 11, 11)),  # Veterans Day
+        _nth_weekday(year, 11, 3, 4),   # Thanksgiving
+        _observed(date(year, 12, 25)),
+    }
+
+
+class BusinessCalendar:
+    """
+    Precomputed calendar: for every day in the range, the ordinal of the first
+    business day on or after it, so "next business day" is a single list lookup.
+    """
+
+    def __init__(self, start_year, years, extra_holidays=()):
+        self.start = date(start_year, 1, 1)
+        self.end = date(start_year + years, 1, 1)
+
+        holidays = set(extra_holidays)
+        for year in range(start_year, start_year + years + 1):
+            holidays |= us_holidays(year)
+        self.holidays = holidays
+
+        # Walk backwards so each day points at the next business day
+        span = (self.end - self.start).days + 14
+        self._next = [0] * span
+        next_ordinal = None
+        for offset in range(span - 1, -1, -1):
+            day = self.start + timedelta(days=offset)
+            if day.weekday() < 5 and day not in holidays:
+                next_ordinal = day.toordinal()
+            self._next[offset] = next_ordinal
+
+    def next_business_day(self, day):
+        """First business day on or after day."""
+        offset = (day - self.start).days
+        if 0 <= offset < len(self._next) and self._next[offset] is not None:
+            return date.fromordinal(self._next[offset])
+        # Outside the precomputed range, fall back to walking
+        while day.weekday() >= 5 or day in self.holidays or day in us_holidays(day.year):
+            day += timedelta(days=1)
+        return day
+
+
+def _parse_extra_holidays(raw):
+    days = set()
+    for part in raw.split(","):
+        part = part.strip()
+        if part:
+            days.add(date.fromisoformat(part))
+    return days
+
+
+_calendar = None
+_calendar_lock = threading.Lock()
+
+
+def get_calendar():
+    """Get the cached business calendar, rebuilding it once the year rolls past it."""
+    global _calendar
+    today = date.today()
+    with _calendar_lock:
+        if _calendar is None or not (_calendar.start <= today < _calendar.end - timedelta(days=366)):
+            _calendar = BusinessCalendar(today.year, CALENDAR_YEARS, _parse_extra_holidays(EXTRA_HOLIDAYS))
+        return _calendar
+
+
+def infer_timezone(timezone=None, location=None):
+    """
+    Work out a recipient's IANA time zone.
+    Uses an explicit time zone if valid, otherwise Apollo-style location info
+    ({"state", "country"} or a "City, State, Country" string).
+    """
+    if timezone:
+        try:
+            ZoneInfo(timezone)
+            return timezone
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+
+    if isinstance(location, dict):
+        parts = [location.get("city"), location.get("state"), location.get("country")]
+    elif isinstance(location, str):
+        parts = location.split(",")
+    else:
+        parts = []
+    parts = [p.strip().lower() for p in parts if p and p.strip()]
+
+    for part in reversed(parts):
+        if part in US_STATE_TIMEZONES:
+            return US_STATE_TIMEZONES[part]
+        if part in COUNTRY_TIMEZONES:
+            return COUNTRY_TIMEZONES[part]
+    return DEFAULT_TIMEZONE
+
+
+# Booked sends per (mailbox, UTC hour) for the hourly cap. Kept in the history
+# database so restarts and other processes sending from the same mailbox see them.
+_bookings_db = None
+_booked_lock = threading.Lock()
+
+
+def _get_bookings_db():
+    global _bookings_db
+    if _bookings_db is None:
+        _bookings_db = sqlite3.connect(BOOKINGS_DB, check_same_thread=False)
+        _bookings_db.execute("""
+            CREATE TABLE IF NOT EXISTS send_bookings (
+                mailbox TEXT,
+                hour INTEGER,
+                count INTEGER,
+                PRIMARY KEY (mailbox, hour)
+            )
+        """)
+        _bookings_db.commit()
+    return _bookings_db
+
+
+def _window_seconds():
+    start = WINDOW_START.hour * 3600 + WINDOW_START.minute * 60
+    end = WINDOW_END.hour * 3600 + WINDOW_END.minute * 60
+    return start, max(end, start + 60)
+
+
+def _book(db, mailbox, local_day, tz, offset_seconds, spread, rng):
+    """
+    Book a send on local_day at roughly offset_seconds into the window.
+    Returns the UTC datetime, or None if every hour in the window is full.
+    """
+    window_start, window_end = _window_seconds()
+    width = window_end - window_start
+    jitter = rng.uniform(-spread / 2, spread / 2) if spread else 0
+
+    # Try the preferred slot first, then walk forward through the window
+    for attempt in range(0, width, 900):
+        seconds = window_start + (offset_seconds + jitter + attempt) % width
+        local = datetime.combine(local_day, time(), tzinfo=tz) + timedelta(seconds=int(seconds))
+        utc = local.astimezone(UTC)
+        hour = int(utc.replace(minute=0, second=0, microsecond=0).timestamp())
+        db.execute("INSERT OR IGNORE INTO send_bookings VALUES (?, ?, 0)", (mailbox, hour))
+        booked = db.execute(
+            "UPDATE send_bookings SET count = count + 1 WHERE mailbox = ? AND hour = ? AND count < ?",
+            (mailbox, hour, MAILBOX_HOURLY_CAP)
+        )
+        if booked.rowcount:
+            return utc
+    return None
+
+
+def assign_send_times(recipients, mailbox="me", now=None, seed=None, dry_run=False):
+    """
+    Assign send times to a batch of recipients in one pass.
+    recipients: list of dicts with optional "timezone" and "location".
+    With dry_run, times are worked out against current bookings but nothing is booked.
+    Returns ISO 8601 UTC strings in the same order.
+    """
+    rng = random.Random(seed)
+    now = now or datetime.now(UTC)
+    calendar = get_calendar()
+    window_start, window_end = _window_seconds()
+    width = window_end - window_start
+
+    # Group by time zone so each group is spread evenly across its own window
+    groups = {}
+    for i, recipient in enumerate(recipients):
+        tz_name = infer_timezone(recipient.get("timezone"), recipient.get("location"))
+        groups.setdefault(tz_name, []).append(i)
+
+    results = [None] * len(recipients)
+    with _booked_lock:
+        db = _get_bookings_db()
+        # One transaction per batch (rolled back on error), so another process
+        # booking the same mailbox waits for it
+        with db:
+            # Forget bookings that are already in the past
+            cutoff = now - timedelta(hours=1)
+            db.execute("DELETE FROM send_bookings WHERE hour < ?", (int(cutoff.timestamp()),))
+
+            for tz_name, indexes in groups.items():
+                tz = ZoneInfo(tz_name)
+                # Never schedule same-day: first candidate is the next local business day
+                local_day = calendar.next_business_day(now.astimezone(tz).date() + timedelta(days=1))
+                remaining = list(indexes)
+
+                while remaining:
+                    spread = width / len(remaining)
+                    leftover = []
+                    for slot, i in enumerate(remaining):
+                        utc = _book(db, mailbox, local_day, tz, slot * spread + spread / 2, spread, rng)
+                        if utc is None:
+                            leftover.append(i)
+                        else:
+                            results[i] = utc.strftime("%Y-%m-%dT%H:%M:%SZ")
+                    # Anyone who didn't fit under the hourly cap rolls to the next business day
+                    remaining = leftover
+                    local_day = calendar.next_business_day(local_day + timedelta(days=1))
+
+            if dry_run:
+                db.rollback()
+
+    return results
+
+
+def release_booking(send_at, mailbox="me"):
+    """Give back the hourly-cap slot booked for send_at (an ISO 8601 UTC string) when the send didn't happen."""
+    utc = datetime.strptime(send_at, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=UTC)
+    hour = int(utc.replace(minute=0, second=0).timestamp())
+    with _booked_lock:
+        db = _get_bookings_db()
+        with db:
+            db.execute(
+                "UPDATE send_bookings SET count = count - 1 WHERE mailbox = ? AND hour = ? AND count > 0",
+                (mailbox, hour)
+            )
+
+
+def next_send_time(timezone=None, location=None, mailbox="me"):
+    """Send time for a single recipient. Returns an ISO 8601 UTC string."""
+    return assign_send_times([{"timezone": timezone, "location": location}], mailbox=mailbox)[0]
@@ -1,26 +1,72 @@
 # server.py
 from flask import Flask, request, jsonify
-import requests
-from anthropic import Anthropic
 import os
 import json
 import re
-import base64
-from datetime import datetime, timedelta
-from zoneinfo import ZoneInfo
-from dotenv import load_dotenv
-
-load_dotenv()
+import threading
+import time
+from functools import wraps
 
+# flask_cors stays eager: it registers its hooks when the app is created
 from flask_cors import CORS
 
+from lazy import lazy_import
+
+_env_loaded = False
+
+
+def load_env():
+    """Load .env into the environment (once, on first use)."""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+# Everything heavy (or that reads settings from .env at import) loads on first use.
+# This keeps cold start cheap for short-lived workers and CLI runs.
+requests = lazy_import("requests", load_env)
+prefetch = lazy_import("prefetch", load_env)
+scheduler = lazy_import("scheduler", load_env)
+suppression = lazy_import("suppression", load_env)
+delivery_tracker = lazy_import("delivery_tracker", load_env)
+transports = lazy_import("transports", load_env)
+message_builder = lazy_import("message_builder", load_env)
+model_router = lazy_import("model_router", load_env)
+admission = lazy_import("admission", load_env)
+recorder = lazy_import("recorder", load_env)
+
 app = Flask(__name__)
 CORS(app)  # allows Chrome extension to call this backend
 
-client = Anthropic(api_key=os.getenv("ANTHROPIC_API_KEY")) #TODO: user input here.
 
-# Dev mode - set to True to load settings from dev_settings.json automatically
-DEV_MODE = os.getenv("DEV_MODE", "false").lower() == "true"
+def admitted(group):
+    """
+    Route decorator: admission control for a route group. Sheds load with a
+    503 + Retry-After when the group's queue is full or the wait runs out.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            gate = admission.get_gate(group)
+            rejected = gate.acquire()
+            if rejected:
+                print(f"Shedding {request.path} ({group}: {rejected})")
+                response = jsonify({
+                    "error": "Server is busy, please retry shortly",
+                    "code": "OVERLOADED",
+                    "reason": rejected
+                })
+                response.headers["Retry-After"] = str(gate.retry_after())
+                return response, 503
+            start = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                gate.release(time.monotonic() - start)
+        return wrapper
+    return decorator
 
 # In-memory storage for user settings
 user_settings = {
@@ -34,8 +80,9 @@ user_settings = {
 
 
 def load_dev_settings():
-    """Load settings from dev_settings.json if in dev mode."""
-    if not DEV_MODE:
+    """Load settings from dev_settings.json if in dev mode (DEV_MODE=true)."""
+    load_env()
+    if os.getenv("DEV_MODE", "false").lower() != "true":
         return
     try:
         with open("backend/dev_settings.json", "r") as f:
@@ -48,8 +95,16 @@ def load_dev_settings():
         print("⚠️  DEV MODE: dev_settings.json is invalid JSON")
 
 
-# Load dev settings on startup
-load_dev_settings()
+_started = False
+
+
+@app.before_request
+def load_settings_on_first_request():
+    """Load .env and dev settings on the first request rather than at import."""
+    global _started
+    if not _started:
+        load_dev_settings()
+        _started = True
 
 
 @app.route("/save-settings", methods=["POST"])
@@ -75,7 +130,52 @@ def save_settings():
     return jsonify({"success": True})
 
 
+def lookup_apollo(linkedin_url):
+    """Look up a LinkedIn URL in Apollo. Returns the /query-apollo response body."""
+    url = "https://api.apollo.io/api/v1/people/match"
+    
+    headers = {
+        "Content-Type": "application/json",
+        "Cache-Control": "no-cache",
+        "x-api-key": user_settings["apolloApiKey"]
+    }
+    
+    payload = {
+        "linkedin_url": linkedin_url,
+        "reveal_personal_emails": True
+    }
+    
+    response = recorder.call(
+        "apollo.people.match",
+        {"path": "people/match", "payload": payload},
+        lambda: requests.post(url, headers=headers, json=payload),
+        encode=recorder.encode_http_response,
+        decode=recorder.decode_http_response,
+    )
+    result = response.json()
+    
+    if result.get("person"):
+        person = result["person"]
+        return {
+            "success": True,
+            "email": person.get("email"),
+            "name": person.get("name"),
+            "title": person.get("title"),
+            "company": person.get("organization", {}).get("name") if person.get("organization") else None,
+            "timezone": scheduler.infer_timezone(person.get("time_zone"), person)
+        }
+    return {
+        "success": False,
+        "error": "No match found in Apollo"
+    }
+
+
+def apollo_prefetch_key(linkedin_url):
+    return prefetch.make_key(linkedin_url, user_settings["apolloApiKey"])
+
+
 @app.route("/query-apollo", methods=["POST"])
+@admitted("enrichment")
 def query_apollo():
     """Query Apollo API to get email from LinkedIn URL."""
     # Check if Apollo API key is configured
@@ -88,47 +188,56 @@ def query_apollo():
     if not linkedin_url:
         return jsonify({"error": "LinkedIn URL is required"}), 400
     
+    prefetched = prefetch.take("apollo", apollo_prefetch_key(linkedin_url))
+    if prefetched is not None:
+        print(f"Serving prefetched Apollo result for {linkedin_url}")
+        return jsonify(prefetched)
+
     try:
-        url = "https://api.apollo.io/api/v1/people/match"
-        
-        headers = {
-            "Content-Type": "application/json",
-            "Cache-Control": "no-cache",
-            "x-api-key": user_settings["apolloApiKey"]
-        }
-        
-        payload = {
-            "linkedin_url": linkedin_url,
-            "reveal_personal_emails": True
-        }
-        
-        response = requests.post(url, headers=headers, json=payload)
-        result = response.json()
-        
-        if result.get("person"):
-            person = result["person"]
-            return jsonify({
-                "success": True,
-                "email": person.get("email"),
-                "name": person.get("name"),
-                "title": person.get("title"),
-                "company": person.get("organization", {}).get("name") if person.get("organization") else None
-            })
-        else:
-            return jsonify({
-                "success": False,
-                "error": "No match found in Apollo"
-            })
-            
+        return jsonify(lookup_apollo(linkedin_url))
     except Exception as e:
         print(f"Error querying Apollo: {e}")
         return jsonify({"error": str(e)}), 500
 
-mic_client_secret = os.getenv("MICROSOFT_CLIENT_SECRET")
-mic_tenant_id = os.getenv("MICROSOFT_TENANT_ID")
-mic_client_id = os.getenv("MICROSOFT_CLIENT_ID")
+def ms_config():
+    """Microsoft app credentials: (client_id, client_secret, tenant_id, token endpoint)."""
+    load_env()
+    mic_tenant_id = os.getenv("MICROSOFT_TENANT_ID")
+    return (
+        os.getenv("MICROSOFT_CLIENT_ID"),
+        os.getenv("MICROSOFT_CLIENT_SECRET"),
+        mic_tenant_id,
+        f"https://login.microsoftonline.com/{mic_tenant_id}/oauth2/v2.0/token"
+    )
+
+
+# New logins also ask for Mail.Read (delivery tracking). Installs that logged in
+# before that only granted SEND_SCOPES, and a refresh can't widen the grant.
+SEND_SCOPES = "Mail.Send offline_access openid profile"
+LOGIN_SCOPES = "Mail.Send Mail.Read offline_access openid profile"
+
 
-endpoint = f"https://login.microsoftonline.com/{mic_tenant_id}/oauth2/v2.0/token"
+def _scope_set(scope):
+    # Token responses may name Graph scopes by full URI
+    return {part.rsplit("/", 1)[-1] for part in scope.split()}
+
+
+def granted_scopes():
+    """Scopes the stored token was granted (empty if we're not logged in)."""
+    try:
+        with open("ms_tokens.json", "r") as f:
+            tokens = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return set()
+    return _scope_set(tokens.get("scope") or SEND_SCOPES)
+
+
+def refresh_scopes(tokens):
+    """Refresh with exactly the scopes the user consented to, never more."""
+    scopes = _scope_set(tokens.get("scope") or SEND_SCOPES)
+    # The token response doesn't echo offline_access, but refreshing needs it
+    scopes.add("offline_access")
+    return " ".join(sorted(scopes))
 
 
 def get_access_token():
@@ -155,13 +264,14 @@ def refresh_access_token():
             print("No refresh token found")
             return None
 
+        mic_client_id, mic_client_secret, _, endpoint = ms_config()
         refresh_payload = {
             "client_id": mic_client_id,
             "client_secret": mic_client_secret,
             "grant_type": "refresh_token",
             "refresh_token": refresh_token,
             "redirect_uri": "http://localhost:3000/auth/callback",
-            "scope": "Mail.Send offline_access openid profile"
+            "scope": refresh_scopes(tokens)
         }
 
         res = requests.post(endpoint, data=refresh_payload)
@@ -183,72 +293,26 @@ def refresh_access_token():
         return None
 
 
-# Path to your resume file - update this to your actual resume location
-RESUME_PATH = os.getenv("RESUME_PATH", "resume.pdf") #TODO: user input here.
-
-
-def get_next_working_day_9am_cst():
-    """
-    Calculate the next working day (Mon-Fri) at 9:00 AM CST.
-    Returns ISO 8601 formatted datetime string in UTC.
-    """
-    cst = ZoneInfo("America/Chicago")
-    now = datetime.now(cst)
-    
-    # Start with tomorrow
-    next_day = now + timedelta(days=1)
-    
-    # Skip weekends (Saturday=5, Sunday=6)
-    while next_day.weekday() >= 5:
-        next_day += timedelta(days=1)
-    
-    # Set to 9:00 AM CST
-    scheduled_time = next_day.replace(hour=9, minute=0, second=0, microsecond=0)
-    
-    # Convert to UTC for Microsoft Graph API
-    utc_time = scheduled_time.astimezone(ZoneInfo("UTC"))
-    
-    # Return in ISO 8601 format
-    return utc_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+def get_resume_path():
+    """Path to your resume file - set RESUME_PATH to your actual resume location."""
+    load_env()
+    return os.getenv("RESUME_PATH", "resume.pdf") #TODO: user input here.
 
 
 def get_resume_attachment():
     """
-    Read and base64 encode the resume file for email attachment.
-    Returns attachment dict for Microsoft Graph API, or None if file doesn't exist.
+    Get the resume file for email attachment (read and encoded once per file version).
+    Returns a message_builder.PreparedAttachment, or None if file doesn't exist.
     """
-    if not os.path.exists(RESUME_PATH):
-        print(f"Resume file not found at: {RESUME_PATH}")
-        return None
-    
+    resume_path = get_resume_path()
     try:
-        with open(RESUME_PATH, "rb") as f:
-            file_content = f.read()
-        
-        # Get filename from path
-        filename = os.path.basename(RESUME_PATH)
-        
-        # Determine content type based on extension
-        ext = filename.lower().split('.')[-1]
-        content_types = {
-            'pdf': 'application/pdf',
-            'doc': 'application/msword',
-            'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
-        }
-        content_type = content_types.get(ext, 'application/octet-stream')
-        
-        # Base64 encode the file
-        encoded_content = base64.b64encode(file_content).decode('utf-8')
-        
-        return {
-            "@odata.type": "#microsoft.graph.fileAttachment",
-            "name": filename,
-            "contentType": content_type,
-            "contentBytes": encoded_content
-        }
+        attachment = message_builder.prepare_attachment(resume_path)
     except Exception as e:
         print(f"Error reading resume file: {e}")
         return None
+    if attachment is None:
+        print(f"Resume file not found at: {resume_path}")
+    return attachment
 
 
 def parse_email_response(response_text):
@@ -292,18 +356,31 @@ def parse_email_response(response_text):
         "body": response_text.strip()
     }
 
-@app.route("/generate-email", methods=["POST"])
-def generate_email():
-    # Check if required settings are configured
+def check_generation_settings():
+    """Returns an error response if the settings needed for generation are missing."""
     if not user_settings["apiKey"]:
         return jsonify({"error": "API key not configured", "code": "SETTINGS_NOT_CONFIGURED"}), 400
     if not user_settings["userName"]:
         return jsonify({"error": "User name not configured", "code": "SETTINGS_NOT_CONFIGURED"}), 400
     if not user_settings["userAbout"]:
         return jsonify({"error": "User about info not configured", "code": "SETTINGS_NOT_CONFIGURED"}), 400
-    
-    profile = request.json  # LinkedIn data
-    
+    return None
+
+
+def generation_prefetch_key(profile):
+    """Prefetch key for a profile: its URL plus everything that shapes the prompt."""
+    return prefetch.make_key(
+        profile.get('linkedinUrl'),
+        user_settings["userName"],
+        user_settings["userAbout"],
+        bool(profile.get('includeResume', False)),
+        bool(profile.get('includeCoffeeChat', False)),
+        profile.get('customInstructions', '').strip(),
+    )
+
+
+def build_email_prompt(profile):
+    """Build the cold email prompt for a LinkedIn profile."""
     # Get preferences
     include_resume = profile.get('includeResume', False)
     include_coffee_chat = profile.get('includeCoffeeChat', False)
@@ -377,14 +454,21 @@ def generate_email():
     }}
     """
 
-    anthropic_client = Anthropic(api_key=user_settings["apiKey"])
+    return prompt
+
+
+def generate_email_content(profile, task="email"):
+    """Generate a cold email for a profile. Returns {"email", "subject"}."""
+    prompt = build_email_prompt(profile)
+
     print("Prompt: ", prompt)
-    response = anthropic_client.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=450,
+    response = model_router.create_message(
+        user_settings["apiKey"],
+        task,
         messages=[
             {"role": "user", "content": prompt}
         ],
+        max_tokens=450,
     )
 
     raw_response = response.content[0].text
@@ -392,25 +476,49 @@ def generate_email():
     parsed = parse_email_response(raw_response)
     print("Parsed: ", parsed)
 
-    output = jsonify({
+    return {
         "email": parsed["body"],
         "subject": parsed["subject"]
-    })
-    return output
+    }
 
 
-@app.route("/generate-connection-message", methods=["POST"])
-def generate_connection_message():
+@app.route("/generate-email", methods=["POST"])
+@admitted("generation")
+def generate_email():
     # Check if required settings are configured
-    if not user_settings["apiKey"]:
-        return jsonify({"error": "API key not configured", "code": "SETTINGS_NOT_CONFIGURED"}), 400
-    if not user_settings["userName"]:
-        return jsonify({"error": "User name not configured", "code": "SETTINGS_NOT_CONFIGURED"}), 400
-    if not user_settings["userAbout"]:
-        return jsonify({"error": "User about info not configured", "code": "SETTINGS_NOT_CONFIGURED"}), 400
-    
-    profile = request.json
+    settings_error = check_generation_settings()
+    if settings_error:
+        return settings_error
     
+    profile = request.json  # LinkedIn data
+
+    blocked = suppression.get_index().check(linkedin_url=profile.get('linkedinUrl'))
+    if blocked:
+        return jsonify({"error": f"Recipient blocked: {blocked}", "code": "SUPPRESSED"}), 409
+
+    # Regenerations go through their own faster tier (Haiku first) and never reuse a prefetch
+    if profile.get('regenerate'):
+        return jsonify(generate_email_content(profile, "regenerate"))
+
+    prefetched = prefetch.take("email", generation_prefetch_key(profile))
+    if prefetched is not None:
+        print(f"Serving prefetched email for {profile.get('linkedinUrl')}")
+        return jsonify(prefetched)
+
+    return jsonify(generate_email_content(profile))
+
+
+def connection_prefetch_key(profile):
+    return prefetch.make_key(
+        profile.get('linkedinUrl'),
+        user_settings["userName"],
+        user_settings["userAbout"],
+        profile.get('customInstructions', '').strip(),
+    )
+
+
+def generate_connection_note(profile):
+    """Generate a LinkedIn connection note (under 300 chars) for a profile."""
     custom_instructions = profile.get('customInstructions', '').strip()
     
     custom_section = ""
@@ -443,11 +551,11 @@ def generate_connection_message():
     Return ONLY the connection note text. No quotes, no JSON, just the raw message.
     """
 
-    anthropic_client = Anthropic(api_key=user_settings["apiKey"])
-    response = anthropic_client.messages.create(
-        model="claude-sonnet-4-20250514",
+    response = model_router.create_message(
+        user_settings["apiKey"],
+        "connection_note",
+        messages=[{"role": "user", "content": prompt}],
         max_tokens=200,
-        messages=[{"role": "user", "content": prompt}]
     )
 
     message = response.content[0].text.strip()
@@ -457,39 +565,109 @@ def generate_connection_message():
         message = message[:297] + "..."
     
     print(f"Generated connection message ({len(message)} chars): {message}")
-    return jsonify({"message": message})
+    return message
 
 
-def send_mail_request(access_token, message):
-    """Helper to make the actual Graph API request."""
-    graph_url = "https://graph.microsoft.com/v1.0/me/sendMail"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
-    return requests.post(graph_url, headers=headers, json=message)
+@app.route("/generate-connection-message", methods=["POST"])
+@admitted("generation")
+def generate_connection_message():
+    # Check if required settings are configured
+    settings_error = check_generation_settings()
+    if settings_error:
+        return settings_error
+    
+    profile = request.json
+
+    message = prefetch.take("connection_note", connection_prefetch_key(profile))
+    if message is None:
+        message = generate_connection_note(profile)
+    return jsonify({"message": message})
 
 
-def format_email_as_html(body_html, signature_html):
+@app.route("/prefetch", methods=["POST"])
+def prefetch_profile():
     """
-    Wrap HTML email body with signature.
-    Body is already HTML from the frontend (contenteditable div).
+    Start generating the email, connection note and Apollo lookup for a profile
+    in the background, as soon as the extension has scraped it.
     """
-    # Add spacing between body and signature
-    return f"<html><body>{body_html}<br><br>{signature_html}</body></html>"
+    profile = request.get_json() or {}
+    linkedin_url = profile.get('linkedinUrl')
+    if not linkedin_url:
+        return jsonify({"error": "LinkedIn URL is required"}), 400
 
+    if suppression.get_index().check(linkedin_url=linkedin_url):
+        return jsonify({"success": True, "started": []})
 
-@app.route('/send-email', methods=['POST'])
-def send_email():
-    try:
-        data = request.get_json()
+    started = []
+    if check_generation_settings() is None:
+        if prefetch.start("email", generation_prefetch_key(profile), generate_email_content, dict(profile)):
+            started.append("email")
+        if prefetch.start("connection_note", connection_prefetch_key(profile), generate_connection_note, dict(profile)):
+            started.append("connection_note")
+    if user_settings["apolloApiKey"]:
+        if prefetch.start("apollo", apollo_prefetch_key(linkedin_url), lookup_apollo, linkedin_url):
+            started.append("apollo")
+
+    print(f"Prefetch for {linkedin_url}: {started or 'nothing started'}")
+    return jsonify({"success": True, "started": started})
+
+
+@app.route("/model-stats", methods=["GET"])
+def model_stats():
+    """Per-model latency and cost for the generation endpoints."""
+    return jsonify(model_router.get_model_stats())
+
+
+@app.route("/prefetch-stats", methods=["GET"])
+def prefetch_stats():
+    """Prefetch hits, waste and budget usage."""
+    return jsonify(prefetch.get_prefetch_stats())
+
+
+@app.route("/admission-stats", methods=["GET"])
+def admission_stats():
+    """Active requests, queue depth and shed counts per route group."""
+    return jsonify(admission.get_admission_stats())
+
+
+@app.route("/recorder-stats", methods=["GET"])
+def recorder_stats():
+    """Whether upstream calls are being recorded or replayed."""
+    return jsonify(recorder.get_recorder_stats())
 
+
+_mail_transport = None
+_mail_transport_lock = threading.Lock()
+
+
+def get_mail_transport():
+    """
+    Get the shared mail transport (created on first send, then reused).
+    MAIL_TRANSPORT picks it: graph (default), smtp or file.
+    """
+    global _mail_transport
+    if _mail_transport is None:
+        with _mail_transport_lock:
+            # Concurrent first sends must share one transport (one SMTP session)
+            if _mail_transport is None:
+                load_env()
+                name = os.getenv("MAIL_TRANSPORT", "graph")
+                _mail_transport = transports.create_transport(name, get_access_token, refresh_access_token)
+    return _mail_transport
+
+
+def deliver_email(data):
+    """
+    Build and send one email. data has the same shape as the /send-email body
+    (plus an optional precomputed "sendAt"). Returns (response body, status code).
+    """
+    try:
         if not data or 'emailBody' not in data or 'emailId' not in data:
-            return jsonify({"error": "Missing required parameters: emailBody and emailId"}), 400
+            return {"error": "Missing required parameters: emailBody and emailId"}, 400
 
         # Check if signature is configured
         if not user_settings["signatureHtml"]:
-            return jsonify({"error": "Email signature not configured", "code": "SETTINGS_NOT_CONFIGURED"}), 400
+            return {"error": "Email signature not configured", "code": "SETTINGS_NOT_CONFIGURED"}, 400
 
         email_body = data['emailBody']
         email_id = data['emailId']
@@ -499,81 +677,145 @@ def send_email():
         
         # Check if resume path is configured when trying to attach resume
         if include_resume and not user_settings["resumePath"]:
-            return jsonify({"error": "Resume path not configured", "code": "SETTINGS_NOT_CONFIGURED"}), 400
+            return {"error": "Resume path not configured", "code": "SETTINGS_NOT_CONFIGURED"}, 400
+
+        # Check and hold the recipient in one step, so concurrent sends to the
+        # same person can't both go out. Released below unless the send succeeds.
+        index = suppression.get_index()
+        linkedin_url = data.get('linkedinUrl')
+        blocked = index.reserve(email=email_id, linkedin_url=linkedin_url)
+        if blocked:
+            return {"error": f"Recipient blocked: {blocked}", "code": "SUPPRESSED"}, 409
+
+        sent = False
+        email = None
+        try:
+            transport = get_mail_transport()
+
+            # Convert email body to HTML with signature
+            signature = message_builder.prepare_signature(user_settings["signatureHtml"])
+            email = transports.OutgoingEmail(
+                to=email_id,
+                subject=email_subject,
+                html=message_builder.render_html(email_body, signature),
+                body_html=email_body,
+                signature=signature
+            )
+
+            # Add deferred send time if scheduling (next business day, in the recipient's time zone).
+            # This books an hourly-cap slot (as did the batch that picked sendAt); given back below if the send fails
+            if schedule_send:
+                if not transport.supports_scheduling:
+                    return {"error": f"Scheduled send is not supported by the {transport.name} transport"}, 400
+                email.send_at = data.get('sendAt') or scheduler.next_send_time(
+                    timezone=data.get('recipientTimezone'),
+                    location=data.get('recipientLocation')
+                )
+                print(f"Email scheduled for: {email.send_at}")
+
+            # Attach resume if requested
+            if include_resume:
+                attachment = get_resume_attachment()
+                if attachment:
+                    email.attachments.append(attachment)
+                    print(f"Attaching resume: {attachment.name}")
+                else:
+                    print("Warning: includeResume was true but no resume file found")
+
+            # Tag the message so Graph notifications can be matched back to it
+            tracker = delivery_tracker.get_tracker(get_access_token, refresh_access_token)
+            tracker.renew_if_needed()
+            tracking_id = tracker.tag(email.headers, email_id, data.get('jobRow'))
+
+            try:
+                result = transport.send(email)
+            except Exception:
+                tracker.mark_failed(tracking_id)
+                raise
+
+            # Check final result
+            if result.ok:
+                index.record_send(email_id, linkedin_url, data.get('jobRow'))
+                sent = True
+                return {"success": True, "trackingId": tracking_id}, 200
+            else:
+                tracker.mark_failed(tracking_id)
+                return {"error": result.error}, result.status
+        finally:
+            if not sent:
+                index.release(email=email_id, linkedin_url=linkedin_url)
+                if email is not None and email.send_at:
+                    scheduler.release_booking(email.send_at)
+            
+    except Exception as e:
+        print(f"Error sending email: {e}")
+        return {"error": str(e)}, 500
 
-        access_token = get_access_token()
-        
-        if not access_token:
-            return jsonify({"error": "No access token found. Please authenticate first."}), 401
-
-        # Convert email body to HTML with signature
-        html_body = format_email_as_html(email_body, user_settings["signatureHtml"])
-
-        message = {
-            "message": {
-                "subject": email_subject,
-                "body": {
-                    "contentType": "HTML",
-                    "content": html_body
-                },
-                "toRecipients": [
-                    {"emailAddress": {"address": email_id}}
-                ]
-            },
-            "saveToSentItems": "true"
-        }
 
-        # Add deferred send time if scheduling (9 AM CST next working day)
-        if schedule_send:
-            deferred_time = get_next_working_day_9am_cst()
-            message["message"]["singleValueExtendedProperties"] = [
-                {
-                    "id": "SystemTime 0x3FEF",  # PidTagDeferredSendTime
-                    "value": deferred_time
-                }
-            ]
-            print(f"Email scheduled for: {deferred_time}")
-
-        # Attach resume if requested
-        if include_resume:
-            attachment = get_resume_attachment()
-            if attachment:
-                message["message"]["attachments"] = [attachment]
-                print(f"Attaching resume: {attachment['name']}")
-            else:
-                print("Warning: includeResume was true but no resume file found")
+@app.route('/send-email', methods=['POST'])
+@admitted("send")
+def send_email():
+    body, status = deliver_email(request.get_json())
+    return jsonify(body), status
+
+
+@app.route('/suppress', methods=['POST'])
+def suppress():
+    """Never contact an email, LinkedIn profile or company domain again."""
+    data = request.get_json() or {}
+    if not any(data.get(k) for k in ("email", "linkedinUrl", "domain")):
+        return jsonify({"error": "One of email, linkedinUrl or domain is required"}), 400
+
+    keys = suppression.get_index().suppress(
+        email=data.get("email"),
+        linkedin_url=data.get("linkedinUrl"),
+        domain=data.get("domain"),
+        reason=data.get("reason", "")
+    )
+    print(f"Suppressed: {keys}")
+    return jsonify({"success": True, "suppressed": keys})
 
-        # First attempt
-        res = send_mail_request(access_token, message)
 
-        # Check if token expired (401 Unauthorized)
-        if res.status_code == 401:
-            res_json = res.json()
-            error_code = res_json.get("error", {}).get("code", "")
-            
-            if error_code == "InvalidAuthenticationToken" or "expired" in str(res_json).lower():
-                print("Access token expired, refreshing...")
-                
-                # Refresh the token
-                new_token = refresh_access_token()
-                
-                if new_token:
-                    # Retry with new token
-                    res = send_mail_request(new_token, message)
-                else:
-                    return jsonify({"error": "Failed to refresh token. Please re-authenticate."}), 401
+@app.route('/graph/subscribe', methods=['POST'])
+def graph_subscribe():
+    """Subscribe to Sent Items / Inbox notifications. notificationUrl must be publicly reachable."""
+    data = request.get_json() or {}
+    notification_url = data.get("notificationUrl") or os.getenv("GRAPH_NOTIFICATION_URL")
+    if not notification_url:
+        return jsonify({"error": "notificationUrl is required"}), 400
 
-        # Check final result
-        if res.status_code == 202:
-            return jsonify({"success": True}), 200
-        else:
-            return jsonify({"error": res.text}), 400
-            
-    except Exception as e:
-        print(f"Error sending email: {e}")
-        return jsonify({"error": str(e)}), 500
+    if "Mail.Read" not in granted_scopes():
+        return jsonify({
+            "error": "Delivery tracking needs Mail.Read. Please log in again to grant it.",
+            "code": "REAUTH_REQUIRED"
+        }), 403
+
+    tracker = delivery_tracker.get_tracker(get_access_token, refresh_access_token)
+    created = tracker.subscribe(notification_url)
+    if not created:
+        return jsonify({"error": "Failed to create Graph subscriptions"}), 400
+    return jsonify({"success": True, "subscriptions": created})
+
+
+@app.route('/graph/notifications', methods=['POST'])
+def graph_notifications():
+    """Webhook receiver for Graph change notifications."""
+    # Graph validates a new subscription by asking us to echo this token back
+    validation_token = request.args.get("validationToken")
+    if validation_token:
+        return validation_token, 200, {"Content-Type": "text/plain"}
+
+    tracker = delivery_tracker.get_tracker(get_access_token, refresh_access_token)
+    tracker.handle_notifications(request.get_json(silent=True) or {})
+    return "", 202
 
 
+@app.route('/delivery-status/<tracking_id>', methods=['GET'])
+def delivery_status(tracking_id):
+    status = delivery_tracker.get_tracker(get_access_token, refresh_access_token).get_status(tracking_id)
+    if status is None:
+        return jsonify({"error": "Unknown tracking id"}), 404
+    return jsonify(status)
 
 
 #MICROSOFT STUFF
@@ -582,12 +824,13 @@ from urllib.parse import urlencode
 
 @app.route("/auth/login")
 def auth_login():
+    mic_client_id, _, mic_tenant_id, _ = ms_config()
     params = {
         "client_id": mic_client_id,
         "response_type": "code",
         "redirect_uri": "http://localhost:3000/auth/callback",
         "response_mode": "query",
-        "scope": "Mail.Send offline_access openid profile",
+        "scope": LOGIN_SCOPES,
         "state": "xyz123"  # can be anything
     }
     auth_url = (
@@ -603,13 +846,14 @@ def auth_callback():
     if not code:
         return "No code provided", 400
 
+    mic_client_id, mic_client_secret, _, endpoint = ms_config()
     token_payload = {
         "client_id": mic_client_id,
         "client_secret": mic_client_secret,
         "grant_type": "authorization_code",
         "code": code,
         "redirect_uri": "http://localhost:3000/auth/callback",
-        "scope": "Mail.Send offline_access openid profile"
+        "scope": LOGIN_SCOPES
     }
 
     token_res = requests.post(endpoint, data=token_payload)
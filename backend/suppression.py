@@ -0,0 +1,265 @@
+"""
+Cross-campaign recipient history and suppression index.
+Past sends and opt-outs are kept in SQLite; a Bloom filter in front answers the
+common "never seen this person" case without touching the database.
+"""
+
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+
+HISTORY_DB = os.getenv("COLDSEND_HISTORY_DB", "coldsend_history.db")
+COMPANY_CONTACT_CAP = int(os.getenv("COMPANY_CONTACT_CAP", "3"))
+BLOOM_CAPACITY = int(os.getenv("BLOOM_CAPACITY", "1000000"))
+BLOOM_ERROR_RATE = 0.001
+
+_PROFILE_RE = re.compile(r"linkedin\.com(/in/[^/?#]+)", re.IGNORECASE)
+
+# Shared mail providers - these don't identify a company, so no per-company cap
+FREE_MAIL_DOMAINS = {
+    "gmail.com", "googlemail.com", "yahoo.com", "outlook.com", "hotmail.com",
+    "live.com", "icloud.com", "me.com", "aol.com", "proton.me", "protonmail.com",
+}
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over a single blake2b digest."""
+
+    def __init__(self, capacity, error_rate=BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+def normalize_email(email):
+    """Lowercase, drop +tags, and drop dots for Gmail addresses."""
+    if not email:
+        return ""
+    email = email.strip().lower()
+    local, _, domain = email.partition("@")
+    if not domain:
+        return email
+    local = local.split("+", 1)[0]
+    if domain in ("gmail.com", "googlemail.com"):
+        local = local.replace(".", "")
+        domain = "gmail.com"
+    return f"{local}@{domain}"
+
+
+def normalize_linkedin_url(url):
+    """
+    Reduce a LinkedIn profile URL to its /in/<slug> path, so variants
+    (query strings, /details/... subpages, trailing slashes) all match.
+    Shared by prefetch keys and the send history.
+    """
+    if not url:
+        return ""
+    match = _PROFILE_RE.search(url)
+    if match:
+        return match.group(1).lower()
+    return url.strip().lower().split("?", 1)[0].split("#", 1)[0].rstrip("/")
+
+
+def company_domain(email):
+    """The company domain for an email, or "" for free mail providers."""
+    domain = normalize_email(email).partition("@")[2]
+    return "" if domain in FREE_MAIL_DOMAINS else domain
+
+
+class SuppressionIndex:
+    """SQLite-backed send history and suppression list with a Bloom filter in front."""
+
+    def __init__(self, path=HISTORY_DB, company_cap=COMPANY_CONTACT_CAP):
+        self.path = path
+        self.company_cap = company_cap
+        self._lock = threading.Lock()
+        self._reserved = {}  # "email:..."/"li:..."/"domain:..." -> in-flight sends
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS sends (
+                email TEXT,
+                linkedin_url TEXT,
+                domain TEXT,
+                job_row INTEGER,
+                sent_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS sends_email ON sends (email);
+            CREATE INDEX IF NOT EXISTS sends_linkedin ON sends (linkedin_url);
+            CREATE TABLE IF NOT EXISTS suppressions (
+                key TEXT PRIMARY KEY,
+                reason TEXT,
+                created_at REAL
+            );
+        """)
+        self._load()
+
+    def _load(self):
+        """Build the Bloom filter and per-company counts from the database."""
+        total = self._db.execute("SELECT COUNT(*) FROM sends").fetchone()[0]
+        total += self._db.execute("SELECT COUNT(*) FROM suppressions").fetchone()[0]
+        self._bloom = BloomFilter(max(BLOOM_CAPACITY, total * 2))
+        self._company_counts = {}
+
+        for email, linkedin_url, domain in self._db.execute("SELECT email, linkedin_url, domain FROM sends"):
+            if email:
+                self._bloom.add(f"email:{email}")
+            if linkedin_url:
+                self._bloom.add(f"li:{linkedin_url}")
+            if domain:
+                self._company_counts[domain] = self._company_counts.get(domain, 0) + 1
+        for (key,) in self._db.execute("SELECT key FROM suppressions"):
+            self._bloom.add(f"suppress:{key}")
+
+    def _maybe_grow(self):
+        if self._bloom.count > self._bloom.capacity:
+            self._load()
+
+    def _seen(self, key, query):
+        """Bloom filter first; only hit SQLite on a possible match."""
+        if key not in self._bloom:
+            return False
+        return self._db.execute(query, (key.split(":", 1)[1],)).fetchone() is not None
+
+    def check(self, email=None, linkedin_url=None):
+        """
+        Check whether a recipient may be contacted.
+        Returns None if they can, otherwise a short reason string.
+        """
+        email, linkedin_url, domain = self._keys(email, linkedin_url)
+        with self._lock:
+            return self._check_locked(email, linkedin_url, domain)
+
+    def reserve(self, email=None, linkedin_url=None):
+        """
+        Check a recipient and, if they may be contacted, hold them for an
+        in-flight send in the same step, so two concurrent sends to the same
+        person can't both pass. Follow with record_send() or release().
+        Returns None when reserved, otherwise the reason it was refused.
+        """
+        email, linkedin_url, domain = self._keys(email, linkedin_url)
+        with self._lock:
+            reason = self._check_locked(email, linkedin_url, domain)
+            if reason is None:
+                for key in self._reservation_keys(email, linkedin_url, domain):
+                    self._reserved[key] = self._reserved.get(key, 0) + 1
+            return reason
+
+    def release(self, email=None, linkedin_url=None):
+        """Drop a reservation whose send didn't happen."""
+        email, linkedin_url, domain = self._keys(email, linkedin_url)
+        with self._lock:
+            self._release_locked(email, linkedin_url, domain)
+
+    @staticmethod
+    def _keys(email, linkedin_url):
+        email = normalize_email(email)
+        return email, normalize_linkedin_url(linkedin_url), company_domain(email) if email else ""
+
+    @staticmethod
+    def _reservation_keys(email, linkedin_url, domain):
+        return [prefix + value for prefix, value in (("email:", email), ("li:", linkedin_url), ("domain:", domain))
+                if value]
+
+    def _release_locked(self, email, linkedin_url, domain):
+        for key in self._reservation_keys(email, linkedin_url, domain):
+            count = self._reserved.get(key, 0) - 1
+            if count > 0:
+                self._reserved[key] = count
+            else:
+                self._reserved.pop(key, None)
+
+    def _check_locked(self, email, linkedin_url, domain):
+        if email and f"suppress:email:{email}" in self._bloom and self._is_suppressed(f"email:{email}"):
+            return "suppressed"
+        if domain and f"suppress:domain:{domain}" in self._bloom and self._is_suppressed(f"domain:{domain}"):
+            return "suppressed"
+        if linkedin_url and f"suppress:li:{linkedin_url}" in self._bloom and self._is_suppressed(f"li:{linkedin_url}"):
+            return "suppressed"
+        if (email and f"email:{email}" in self._reserved) or (linkedin_url and f"li:{linkedin_url}" in self._reserved):
+            return "in_flight"
+        if email and self._seen(f"email:{email}", "SELECT 1 FROM sends WHERE email = ? LIMIT 1"):
+            return "already_contacted"
+        if linkedin_url and self._seen(f"li:{linkedin_url}", "SELECT 1 FROM sends WHERE linkedin_url = ? LIMIT 1"):
+            return "already_contacted"
+        if domain and self.company_cap:
+            contacted = self._company_counts.get(domain, 0) + self._reserved.get(f"domain:{domain}", 0)
+            if contacted >= self.company_cap:
+                return "company_cap"
+        return None
+
+    def _is_suppressed(self, key):
+        return self._db.execute("SELECT 1 FROM suppressions WHERE key = ?", (key,)).fetchone() is not None
+
+    def record_send(self, email, linkedin_url=None, job_row=None):
+        """Record a successful send (and drop its reservation, if any)."""
+        email, linkedin_url, domain = self._keys(email, linkedin_url)
+
+        with self._lock:
+            self._release_locked(email, linkedin_url, domain)
+            self._db.execute(
+                "INSERT INTO sends (email, linkedin_url, domain, job_row, sent_at) VALUES (?, ?, ?, ?, ?)",
+                (email or None, linkedin_url or None, domain or None, job_row, time.time())
+            )
+            self._db.commit()
+            if email:
+                self._bloom.add(f"email:{email}")
+            if linkedin_url:
+                self._bloom.add(f"li:{linkedin_url}")
+            if domain:
+                self._company_counts[domain] = self._company_counts.get(domain, 0) + 1
+            self._maybe_grow()
+
+    def suppress(self, email=None, linkedin_url=None, domain=None, reason=""):
+        """Add an email, LinkedIn profile or whole company domain to the suppression list."""
+        keys = []
+        if email:
+            keys.append(f"email:{normalize_email(email)}")
+        if linkedin_url:
+            keys.append(f"li:{normalize_linkedin_url(linkedin_url)}")
+        if domain:
+            keys.append(f"domain:{domain.strip().lower().lstrip('@')}")
+
+        with self._lock:
+            for key in keys:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO suppressions (key, reason, created_at) VALUES (?, ?, ?)",
+                    (key, reason, time.time())
+                )
+                self._bloom.add(f"suppress:{key}")
+            self._db.commit()
+            self._maybe_grow()
+        return keys
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Get the shared suppression index (opened on first use)."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SuppressionIndex()
+        return _index
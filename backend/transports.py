@@ -0,0 +1,239 @@
+"""
+Mail transports.
+deliver_email builds a transport-neutral OutgoingEmail; a transport turns it
+into whatever its backend wants. Graph (sendMail), SMTP and a file sink that
+writes .eml files are supported. Pick one with MAIL_TRANSPORT.
+"""
+
+import json
+import os
+import smtplib
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+from email.utils import formatdate, make_msgid
+from typing import Optional
+
+import requests
+
+import message_builder
+import recorder
+
+GRAPH_SEND_URL = "https://graph.microsoft.com/v1.0/me/sendMail"
+
+
+@dataclass
+class OutgoingEmail:
+    """An email ready to send, independent of how it's sent."""
+    to: str
+    subject: str
+    html: str
+    attachments: list = field(default_factory=list)  # message_builder.PreparedAttachment
+    headers: dict = field(default_factory=dict)
+    send_at: Optional[str] = None  # ISO 8601 UTC, for deferred sends
+    # When set, Graph splices the pre-serialized signature instead of re-encoding html
+    body_html: Optional[str] = None
+    signature: Optional[message_builder.PreparedSignature] = None
+
+
+@dataclass
+class SendResult:
+    ok: bool
+    status: int = 200
+    error: Optional[str] = None
+
+
+def build_mime(email, sender):
+    """Build a MIME message (for SMTP and the file sink)."""
+    msg = EmailMessage()
+    msg["From"] = sender
+    msg["To"] = email.to
+    msg["Subject"] = email.subject
+    msg["Date"] = formatdate(localtime=True)
+    msg["Message-ID"] = make_msgid()
+    for name, value in email.headers.items():
+        msg[name] = value
+    msg.set_content(email.html, subtype="html")
+    if email.attachments:
+        # Attachment parts are encoded once per file version and shared
+        msg.make_mixed()
+        for attachment in email.attachments:
+            msg.attach(attachment.mime_part)
+    return msg
+
+
+class MailTransport:
+    """Base class. Transports must be safe to share across threads."""
+    name = "base"
+    supports_scheduling = False
+
+    def send(self, email):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class GraphTransport(MailTransport):
+    """Microsoft Graph /me/sendMail, reusing one HTTP session."""
+    name = "graph"
+    supports_scheduling = True
+
+    def __init__(self, get_token, refresh_token):
+        self.get_token = get_token
+        self.refresh_token = refresh_token
+        self.session = requests.Session()
+
+    def build_payload(self, email):
+        """Serialized sendMail JSON body (bytes)."""
+        return message_builder.graph_payload(email)
+
+    def send_mail_request(self, access_token, message):
+        """Make the actual Graph API request."""
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json"
+        }
+        return recorder.call(
+            "graph.send_mail",
+            lambda: {"url": GRAPH_SEND_URL, "payload": json.loads(message)},
+            lambda: self.session.post(GRAPH_SEND_URL, headers=headers, data=message),
+            encode=recorder.encode_http_response,
+            decode=recorder.decode_http_response,
+        )
+
+    def send(self, email):
+        access_token = self.get_token()
+        if not access_token:
+            return SendResult(False, 401, "No access token found. Please authenticate first.")
+
+        message = self.build_payload(email)
+        res = self.send_mail_request(access_token, message)
+
+        # Check if token expired (401 Unauthorized)
+        if res.status_code == 401:
+            res_json = res.json()
+            error_code = res_json.get("error", {}).get("code", "")
+
+            if error_code == "InvalidAuthenticationToken" or "expired" in str(res_json).lower():
+                print("Access token expired, refreshing...")
+                new_token = self.refresh_token()
+                if not new_token:
+                    return SendResult(False, 401, "Failed to refresh token. Please re-authenticate.")
+                res = self.send_mail_request(new_token, message)
+
+        if res.status_code == 202:
+            return SendResult(True)
+        return SendResult(False, 400, res.text)
+
+
+class SmtpTransport(MailTransport):
+    """
+    SMTP with a persistent session: one login, many messages per connection.
+    The connection is recycled after SMTP_MAX_PER_CONNECTION messages or if the
+    server drops it.
+    """
+    name = "smtp"
+
+    def __init__(self, host, port=587, username=None, password=None, sender=None,
+                 starttls=True, max_per_connection=100):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender or username
+        if not self.sender:
+            raise ValueError("SMTP transport needs a sender: set SMTP_FROM or SMTP_USERNAME")
+        self.starttls = starttls
+        self.max_per_connection = max_per_connection
+        self._conn = None
+        self._sent_on_conn = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = smtplib.SMTP(self.host, self.port, timeout=30)
+        if self.starttls:
+            conn.starttls()
+        if self.username:
+            conn.login(self.username, self.password)
+        self._conn = conn
+        self._sent_on_conn = 0
+
+    def _drop(self):
+        if self._conn is not None:
+            try:
+                self._conn.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+        self._conn = None
+
+    def send(self, email):
+        if email.send_at:
+            return SendResult(False, 400, "Scheduled send is not supported by the SMTP transport")
+
+        msg = build_mime(email, self.sender)
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._conn is None or self._sent_on_conn >= self.max_per_connection:
+                        self._drop()
+                        self._connect()
+                    self._conn.send_message(msg)
+                    self._sent_on_conn += 1
+                    return SendResult(True)
+                except (smtplib.SMTPServerDisconnected, ConnectionError):
+                    # Stale persistent connection - reconnect once
+                    self._drop()
+                    if attempt:
+                        return SendResult(False, 502, "SMTP server disconnected")
+                except smtplib.SMTPException as e:
+                    self._drop()
+                    return SendResult(False, 400, str(e))
+
+    def close(self):
+        with self._lock:
+            self._drop()
+
+
+class FileSinkTransport(MailTransport):
+    """Writes each email as an .eml file. Safe offline target for testing and load runs."""
+    name = "file"
+    supports_scheduling = True
+
+    def __init__(self, directory="outbox", sender="coldsend@localhost"):
+        self.directory = directory
+        self.sender = sender
+        os.makedirs(directory, exist_ok=True)
+
+    def send(self, email):
+        msg = build_mime(email, self.sender)
+        if email.send_at:
+            msg["X-Deferred-Send-Time"] = email.send_at
+        path = os.path.join(self.directory, f"{time.time_ns()}-{uuid.uuid4().hex[:8]}.eml")
+        with open(path, "wb") as f:
+            f.write(msg.as_bytes())
+        return SendResult(True)
+
+
+def create_transport(name, get_token=None, refresh_token=None):
+    """Create a transport from its name and env settings."""
+    if name == "graph":
+        return GraphTransport(get_token, refresh_token)
+    if name == "smtp":
+        return SmtpTransport(
+            host=os.getenv("SMTP_HOST", "localhost"),
+            port=int(os.getenv("SMTP_PORT", "587")),
+            username=os.getenv("SMTP_USERNAME"),
+            password=os.getenv("SMTP_PASSWORD"),
+            sender=os.getenv("SMTP_FROM"),
+            starttls=os.getenv("SMTP_STARTTLS", "true").lower() == "true",
+            max_per_connection=int(os.getenv("SMTP_MAX_PER_CONNECTION", "100")),
+        )
+    if name == "file":
+        return FileSinkTransport(
+            directory=os.getenv("MAIL_SINK_DIR", "outbox"),
+            sender=os.getenv("MAIL_SINK_FROM", "coldsend@localhost"),
+        )
+    raise ValueError(f"Unknown mail transport: {name}")
@@ -0,0 +1,67 @@
+"""
+Offline pipeline benchmark driven by a recording of real upstream traffic.
+
+    COLDSEND_RECORD=calls.jsonl.gz python coldsend.py run --input leads.jsonl   # record once
+    python benchmarks/replay.py --recording calls.jsonl.gz --input leads.jsonl
+    python benchmarks/replay.py --recording calls.jsonl.gz --input leads.jsonl --latency 0 --profile replay.prof
+
+Runs `coldsend.py run` in-process with Anthropic/Apollo/Graph served from the
+recording at recorded latency (scaled by --latency). Generated emails go to
+--out-dir unless --send is given. With --profile, cProfile stats are written
+for snakeviz/pstats; for py-spy, run this script under `py-spy record`.
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recording", required=True, help="gzip JSONL written with COLDSEND_RECORD")
+    parser.add_argument("--input", required=True, help="leads file (.csv or .jsonl)")
+    parser.add_argument("--latency", type=float, default=1.0, help="recorded latency multiplier (0 = instant)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--out-dir", default="generated", help="where generated emails are written")
+    parser.add_argument("--send", action="store_true", help="go through deliver_email instead of writing files")
+    parser.add_argument("--profile", help="write cProfile stats here")
+    args = parser.parse_args()
+
+    # Must be set before the backend modules are imported
+    os.environ["COLDSEND_REPLAY"] = os.path.abspath(args.recording)
+    os.environ["COLDSEND_REPLAY_LATENCY"] = str(args.latency)
+    sys.path[:0] = [ROOT, os.path.join(ROOT, "backend")]
+
+    import coldsend
+    import recorder
+
+    argv = ["run", "--input", args.input, "--workers", str(args.workers)]
+    if not args.send:
+        argv += ["--dry-run", "--out-dir", args.out_dir]
+
+    profiler = cProfile.Profile() if args.profile else None
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        status = coldsend.main(argv)
+    finally:
+        if profiler:
+            profiler.disable()
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{elapsed:.2f}s wall, latency x{args.latency}, replay {recorder.get_recorder_stats()}", file=sys.stderr)
+    if profiler:
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(15)
+        print(f"Profile written to {args.profile}", file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Row-parsing benchmark for sheets_integ on a synthetic sheet.
+
+    python benchmarks/sheets_rows.py
+    python benchmarks/sheets_rows.py --rows 100000 --pending-every 100
+
+Swaps the worksheet for an in-memory fake, so it measures parsing/filtering
+only (no network). Reports wall time and peak allocations per query.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sheets_integ
+
+
+class FakeWorksheet:
+    """
+    Just enough of a gspread Worksheet for the read paths.
+    Counts calls and characters returned, as a stand-in for bandwidth.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = 0
+        self.chars = 0
+
+    def _out(self, rows):
+        self.calls += 1
+        # gspread builds fresh lists for each call
+        rows = [list(row) for row in rows]
+        self.chars += sum(len(cell) for row in rows for cell in row)
+        return rows
+
+    def row_values(self, row):
+        return self._out([self.rows[row - 1]])[0]
+
+    def get_all_values(self):
+        return self._out(self.rows)
+
+    def col_values(self, col):
+        values = self._out([[row[col - 1]] if len(row) >= col else [""] for row in self.rows])
+        return [row[0] for row in values]
+
+    def batch_get(self, ranges):
+        result = []
+        for label in ranges:
+            start, _, end = label.partition(":")
+            (first_col, first), (last_col, last) = _cell(start), _cell(end or start)
+            result.append([row[first_col:last_col + 1] for row in self.rows[first - 1:last]])
+        self.calls += 1
+        self.chars += sum(len(cell) for values in result for row in values for cell in row)
+        return result
+
+    def batch_update(self, updates):
+        self.calls += 1
+        for update in updates:
+            col, row = _cell(update["range"])
+            cells = self.rows[row - 1]
+            cells.extend([""] * (col + 1 - len(cells)))
+            cells[col] = str(update["values"][0][0])
+
+
+def _cell(label):
+    """'AB12' -> (0-based column, 1-based row)."""
+    letters = label.rstrip("0123456789")
+    col = 0
+    for letter in letters:
+        col = col * 26 + ord(letter) - ord('A') + 1
+    return col - 1, int(label[len(letters):])
+
+
+def make_rows(count, pending_every, description_size, bad_every=0):
+    header = list(sheets_integ.COLUMNS)
+    description = "x" * description_size
+    rows = [header]
+    for i in range(count):
+        status = "pending" if i % pending_every == 0 else "done"
+        row = [f"Company {i}", f"https://www.linkedin.com/company/c{i}", "Software Engineer",
+               description, status, "2026-01-01", "10", "3", "2", ""]
+        if bad_every and i % bad_every == 0:
+            row[6] = "ten"  # malformed max_emails
+        # The API trims trailing empty cells
+        rows.append(row[:-1] if i % 2 else row)
+    return rows
+
+
+def measure(name, fn):
+    ws = sheets_integ._worksheet
+    ws.calls = ws.chars = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if isinstance(result, int):
+        count = result
+    else:
+        count = len(result) if isinstance(result, list) else int(result is not None)
+    print(f"{name:28s} {elapsed * 1000:8.1f} ms   peak {peak / 1e6:7.1f} MB   "
+          f"{ws.calls:3d} fetches {ws.chars / 1e6:7.2f} Mchars   {count} entries")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--pending-every", type=int, default=100, help="1 in N rows is pending")
+    parser.add_argument("--description-size", type=int, default=1000, help="chars of job_description per row")
+    parser.add_argument("--bad-every", type=int, default=0, help="1 in N rows has a malformed cell (0 = none)")
+    args = parser.parse_args()
+
+    sheets_integ._worksheet = FakeWorksheet(
+        make_rows(args.rows, args.pending_every, args.description_size, args.bad_every))
+    print(f"{args.rows} rows, 1 in {args.pending_every} pending\n")
+
+    measure("get_next_pending_job", sheets_integ.get_next_pending_job)
+    measure("get_pending_jobs", sheets_integ.get_pending_jobs)
+    measure("iter_jobs('pending') stream", lambda: sum(1 for _ in sheets_integ.iter_jobs("pending")))
+    measure("get_all_jobs", sheets_integ.get_all_jobs)
+
+
+if __name__ == "__main__":
+    main()
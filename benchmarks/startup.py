@@ -0,0 +1,76 @@
+"""
+Cold-start benchmark for the backend and the sheets module.
+
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 20 --importtime
+
+Each case runs in a fresh interpreter so nothing is cached between runs.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SETUP = f"import sys, time; sys.path[:0] = [{ROOT!r}, {os.path.join(ROOT, 'backend')!r}]; t = time.perf_counter()\n"
+
+CASES = {
+    "import server": "import server",
+    "import sheets_integ": "import sheets_integ",
+    "server + first /auth/login": (
+        "import server\n"
+        "server.app.test_client().get('/auth/login')"
+    ),
+}
+
+
+def run_case(code):
+    script = SETUP + code + "\nprint(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1])
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def top_imports(module, count=15):
+    """Slowest imports (cumulative) from python -X importtime."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import sys; sys.path[:0] = [{ROOT!r}, {os.path.join(ROOT, 'backend')!r}]; import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.split("|")]
+        rows.append((int(cumulative_us), name))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--importtime", action="store_true", help="also list the slowest imports")
+    args = parser.parse_args()
+
+    for name, code in CASES.items():
+        try:
+            times = [run_case(code) * 1000 for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{name:32s} failed: {e}")
+            continue
+        print(f"{name:32s} median {statistics.median(times):7.1f} ms   "
+              f"min {min(times):7.1f} ms   max {max(times):7.1f} ms")
+
+    if args.importtime:
+        for module in ("server", "sheets_integ"):
+            print(f"\nslowest imports for {module}:")
+            for cumulative_us, name in top_imports(module):
+                print(f"  {cumulative_us / 1000:7.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Headless campaign runner - runs the whole pipeline without the Chrome extension.
+
+    python coldsend.py run --input leads.jsonl
+    python coldsend.py run --input leads.csv --dry-run --out-dir generated/
+    python coldsend.py run --sheet --jobs 5
+
+Each lead needs a linkedinUrl plus whatever profile info we have (name,
+headline, about, experiences). If there's no email, Apollo is queried for it.
+With --sheet, leads come from pending jobs in the Google Sheet instead: people
+at each job's company are discovered through Apollo people search.
+Generation, enrichment and sending call the backend functions in-process.
+"""
+
+import argparse
+import csv
+import html
+import json
+import os
+import re
+import sys
+import threading
+import time
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+
+def load_leads(path):
+    """Read leads from a .csv or .jsonl file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            leads = list(csv.DictReader(f))
+        else:
+            leads = [json.loads(line) for line in f if line.strip()]
+
+    for lead in leads:
+        # CSVs can only hold experiences as a JSON string
+        if isinstance(lead.get("experiences"), str) and lead["experiences"].startswith("["):
+            lead["experiences"] = json.loads(lead["experiences"])
+    return [lead for lead in leads if lead.get("linkedinUrl")]
+
+
+def text_to_html(text):
+    """Same conversion the extension does before sending a generated email."""
+    return html.escape(text, quote=False).replace("\n", "<br>")
+
+
+def _slug(lead):
+    match = re.search(r"/in/([^/?#]+)", lead.get("linkedinUrl", ""))
+    return match.group(1) if match else re.sub(r"\W+", "-", lead.get("name") or "lead")
+
+
+class Progress:
+    """Thread-safe progress line for a stage."""
+
+    def __init__(self, stage, total):
+        self.stage = stage
+        self.total = total
+        self.counts = {}
+        self.done = 0
+        self.start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def update(self, outcome):
+        with self._lock:
+            self.done += 1
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+            rate = self.done / max(time.monotonic() - self.start, 1e-6)
+            summary = " ".join(f"{k}={v}" for k, v in sorted(self.counts.items()))
+            print(f"[{self.stage}] {self.done}/{self.total} {summary} ({rate:.1f}/s)", file=sys.stderr, flush=True)
+
+
+def run_stage(name, items, fn, workers):
+    """Run fn over items concurrently. fn returns an outcome label."""
+    progress = Progress(name, len(items))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(fn, item) for item in items]
+        for future in as_completed(futures):
+            try:
+                outcome = future.result()
+            except Exception as e:
+                print(f"[{name}] error: {e}", file=sys.stderr)
+                outcome = "failed"
+            progress.update(outcome)
+    return progress.counts
+
+
+def process_leads(server, leads, args):
+    """Enrich, schedule, generate and send a list of leads. Returns outcome counts."""
+    import scheduler
+    import suppression
+
+    index = suppression.get_index()
+
+    # 1. Enrichment: drop suppressed leads, find emails through Apollo
+    def enrich(lead):
+        if index.check(email=lead.get("email"), linkedin_url=lead["linkedinUrl"]):
+            lead["skip"] = "suppressed"
+            return "suppressed"
+        if lead.get("email"):
+            return "has_email"
+        if not server.user_settings["apolloApiKey"]:
+            lead["skip"] = "no_email"
+            return "no_email"
+        result = server.lookup_apollo(lead["linkedinUrl"])
+        if not result.get("success") or not result.get("email"):
+            lead["skip"] = "no_email"
+            return "no_email"
+        lead["email"] = result["email"]
+        lead["timezone"] = result.get("timezone")
+        return "enriched"
+
+    run_stage("enrich", leads, enrich, args.workers)
+    leads = [lead for lead in leads if not lead.get("skip")]
+
+    # 2. Scheduling: assign every send time in one pass so they're spread out
+    if args.schedule and leads:
+        send_times = scheduler.assign_send_times(
+            [{"timezone": lead.get("timezone"), "location": lead.get("location")} for lead in leads],
+            dry_run=args.dry_run
+        )
+        for lead, send_at in zip(leads, send_times):
+            lead["sendAt"] = send_at
+
+    # 3. Generation + send
+    if args.dry_run:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    def generate_and_send(lead):
+        instructions = "\n".join(filter(None, [args.instructions, lead.get("jobContext")]))
+        profile = dict(lead, includeResume=args.resume, includeCoffeeChat=args.coffee_chat,
+                       customInstructions=instructions)
+        generated = server.generate_email_content(profile)
+
+        if args.dry_run:
+            path = os.path.join(args.out_dir, f"{_slug(lead)}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({
+                    "to": lead["email"],
+                    "linkedinUrl": lead["linkedinUrl"],
+                    "subject": generated["subject"],
+                    "body": generated["email"],
+                    "sendAt": lead.get("sendAt"),
+                }, f, indent=2)
+            return "written"
+
+        body, status = server.deliver_email({
+            "emailId": lead["email"],
+            "emailBody": text_to_html(generated["email"]),
+            "subject": generated["subject"],
+            "includeResume": args.resume,
+            "scheduleSend": args.schedule,
+            "sendAt": lead.get("sendAt"),
+            "recipientTimezone": lead.get("timezone"),
+            "linkedinUrl": lead["linkedinUrl"],
+            "jobRow": lead.get("jobRow"),
+        })
+        if status != 200:
+            print(f"Send to {lead['email']} failed: {body.get('error')}", file=sys.stderr)
+            return "failed"
+        return "sent"
+
+    return run_stage("send" if not args.dry_run else "generate", leads, generate_and_send, args.workers)
+
+
+def run_sheet(server, args):
+    """Work through pending jobs in the sheet: discover people, then email them."""
+    import discovery
+    import sheets_integ
+
+    if not server.user_settings["apolloApiKey"]:
+        print("Discovery needs an Apollo API key (apolloApiKey in settings)", file=sys.stderr)
+        return {"failed": 1}
+
+    discoverer = discovery.Discoverer(server.user_settings["apolloApiKey"], remember=not args.dry_run)
+    totals = {}
+    jobs = sheets_integ.iter_jobs("pending")
+    for job in (islice(jobs, args.jobs) if args.jobs else jobs):
+        print(f"Job row {job.row_number}: {job.job_title} at {job.company_name}", file=sys.stderr)
+        if not args.dry_run:
+            sheets_integ.update_status(job.row_number, "scraping")
+
+        job_context = f"I'm interested in the {job.job_title} role at {job.company_name}."
+        leads = []
+        try:
+            for batch in discoverer.discover(job):
+                for lead in batch:
+                    lead["jobContext"] = job_context
+                leads.extend(batch)
+                print(f"  discovered {len(leads)} so far", file=sys.stderr)
+        except Exception as e:
+            print(f"  discovery failed: {e}", file=sys.stderr)
+            if not args.dry_run:
+                sheets_integ.update_status(job.row_number, "pending")
+                sheets_integ.add_note(job.row_number, f"discovery failed: {e}")
+            totals["failed"] = totals.get("failed", 0) + 1
+            continue
+
+        if args.limit:
+            leads = leads[:args.limit]
+        if not args.dry_run:
+            sheets_integ.update_profiles_found(job.row_number, job.profiles_found + len(leads))
+            sheets_integ.update_status(job.row_number, "emailing")
+
+        counts = process_leads(server, leads, args) if leads else {}
+        for outcome, count in counts.items():
+            totals[outcome] = totals.get(outcome, 0) + count
+
+        if not args.dry_run:
+            sent = counts.get("sent", 0)
+            if sent:
+                sheets_integ.update_emails_sent(job.row_number, job.emails_sent + sent)
+            # Back to pending if the cap isn't reached yet, so the next run finds more people
+            done = job.emails_sent + sent >= job.max_emails or not leads
+            sheets_integ.update_status(job.row_number, "done" if done else "pending")
+    return totals
+
+
+def run(args):
+    import server
+
+    # scheduler, suppression, discovery and recorder read their settings at
+    # import, so .env has to be in the environment before any of them load
+    server.load_env()
+
+    if args.settings:
+        with open(args.settings) as f:
+            server.user_settings.update(json.load(f))
+
+    if args.sheet:
+        counts = run_sheet(server, args)
+    else:
+        leads = load_leads(args.input)
+        if args.limit:
+            leads = leads[:args.limit]
+        print(f"Loaded {len(leads)} leads from {args.input}", file=sys.stderr)
+        counts = process_leads(server, leads, args)
+
+    print(json.dumps(counts))
+    return 0 if not counts.get("failed") else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="coldsend", description="Run cold outreach campaigns headlessly.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="generate and send emails for a file of leads")
+    source = run_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="leads file (.csv or .jsonl)")
+    source.add_argument("--sheet", action="store_true", help="discover leads for pending jobs in the Google Sheet")
+    run_parser.add_argument("--settings", default="backend/dev_settings.json",
+                            help="settings JSON (same keys as /save-settings)")
+    run_parser.add_argument("--dry-run", action="store_true", help="write generated emails to disk instead of sending")
+    run_parser.add_argument("--out-dir", default="generated", help="where --dry-run writes emails")
+    run_parser.add_argument("--workers", type=int, default=4, help="concurrent leads in flight")
+    run_parser.add_argument("--limit", type=int, default=0, help="only process the first N leads (per job with --sheet)")
+    run_parser.add_argument("--jobs", type=int, default=0, help="with --sheet, only work on the first N pending jobs")
+    run_parser.add_argument("--schedule", action="store_true", help="schedule sends instead of sending now")
+    run_parser.add_argument("--resume", action="store_true", help="attach resume")
+    run_parser.add_argument("--coffee-chat", action="store_true", help="ask for a coffee chat")
+    run_parser.add_argument("--instructions", default="", help="custom instructions for generation")
+
+    args = parser.parse_args(argv)
+    if args.settings and not os.path.exists(args.settings):
+        args.settings = None
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -50,7 +50,9 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
         experiences: profileData.experiences,
         includeResume: preferences.includeResume || false,
         includeCoffeeChat: preferences.includeCoffeeChat || false,
-        customInstructions: preferences.customInstructions || ''
+        customInstructions: preferences.customInstructions || '',
+        linkedinUrl: linkedinUrl,
+        regenerate: message.regenerate || false
       })
     }).then(response => response.json());
 
@@ -78,6 +80,13 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
           sendResponse({ success: false, error: emailData.error, needsSetup: true });
           return;
         }
+
+        // Backend is shedding load, or the recipient is suppressed / already
+        // contacted - surface its message instead of an empty email
+        if (emailData.code === "OVERLOADED" || emailData.code === "SUPPRESSED") {
+          sendResponse({ success: false, error: emailData.error, suppressed: emailData.code === "SUPPRESSED" });
+          return;
+        }
         
         console.log("Email generated:", emailData);
         console.log("Apollo result:", apolloData);
@@ -87,6 +96,7 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
           email: emailData.email, 
           subject: emailData.subject,
           apolloEmail: apolloData.success ? apolloData.email : null,
+          apolloTimezone: apolloData.success ? apolloData.timezone : null,
           apolloError: apolloData.success ? null : apolloData.error
         });
       })
@@ -125,7 +135,8 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
         headline: profileData.headline,
         about: profileData.about,
         experiences: profileData.experiences,
-        customInstructions: preferences.customInstructions || ''
+        customInstructions: preferences.customInstructions || '',
+        linkedinUrl: profileData.profileUrl || ''
       })
     })
     .then(response => response.json())
@@ -137,6 +148,10 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
         sendResponse({ success: false, error: data.error, needsSetup: true });
         return;
       }
+      if (data.code === "OVERLOADED") {
+        sendResponse({ success: false, error: data.error });
+        return;
+      }
       console.log("Connection message generated:", data);
       sendResponse({ success: true, message: data.message });
     })
@@ -148,6 +163,46 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
     return true;
   }
   
+  if (message.action === 'prefetchProfile') {
+    // Speculatively start generation + Apollo lookup as soon as a profile is scraped,
+    // using the last preferences saved by the popup so the prefetch keys match
+    const profileData = message.data;
+
+    chrome.storage.local.get('coldsend_preferences', result => {
+      // Defaults mirror the popup's checkboxes (coffee chat is on by default)
+      const preferences = result.coldsend_preferences || { includeCoffeeChat: true };
+
+      fetch(`${API_URL}/prefetch`, {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json"
+        },
+        body: JSON.stringify({
+          name: profileData.name,
+          headline: profileData.headline,
+          about: profileData.about,
+          experiences: profileData.experiences,
+          includeResume: preferences.includeResume || false,
+          includeCoffeeChat: preferences.includeCoffeeChat || false,
+          customInstructions: preferences.customInstructions || '',
+          linkedinUrl: profileData.profileUrl
+        })
+      })
+      .then(response => response.json())
+      .then(data => {
+        console.log("Prefetch started:", data);
+        sendResponse({ success: true, started: data.started || [] });
+      })
+      .catch(err => {
+        // Prefetching is best effort, the normal flow still works without it
+        console.log("Prefetch failed:", err);
+        sendResponse({ success: false, error: err.message });
+      });
+    });
+
+    return true;
+  }
+
   if (message.action === 'sendEmail') {
     fetch(`${API_URL}/send-email`, {
       method: "POST",
@@ -159,7 +214,9 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
         emailBody: message.emailBody,
         subject: message.subject || '',
         includeResume: message.includeResume,
-        scheduleSend: message.scheduleSend || false
+        scheduleSend: message.scheduleSend || false,
+        recipientTimezone: message.recipientTimezone || null,
+        linkedinUrl: message.linkedinUrl || ''
       })
     })
     .then(response => response.json())
@@ -172,7 +229,7 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
         return;
       }
       console.log("Email sent:", data);
-      sendResponse({ success: data.success, message: data.message });
+      sendResponse({ success: data.success, message: data.message, error: data.error });
     })
     .catch(err => {
       console.error("Error sending email:", err);
@@ -348,6 +348,43 @@ function extractDescription(item, exp) {
   return null;
 }
 
+// Last scrape, so a click right after the prefetch scrape doesn't redo the work
+let lastScrape = null;
+
+/**
+ * Expands and scrapes the current profile page.
+ * Reuses the last scrape if we're still on the same profile.
+ * @returns {Promise<Object|null>} Profile data, or null if no profile is loaded
+ */
+async function scrapeProfile() {
+  const profileUrl = window.location.href;
+  if (lastScrape && lastScrape.profileUrl === profileUrl) {
+    return lastScrape.data;
+  }
+
+  const h1 = await waitFor("h1");
+  if (!h1) return null;
+
+  // Expand all "see more" buttons on the page first
+  console.log("ColdSend: Expanding all sections...");
+  
+  // we're running this 10 times just to make sure all sections are expanded, one time isn't enough for some reason
+  for (let i = 0; i < 10; i++) {
+    await expandAllSeeMore();
+  }
+
+  const name = getText("h1");
+  const headline = getText(".text-body-medium.break-words");
+  const about = getAboutSection();
+  const experiences = getExperiences();
+
+  console.log("Captured profile:", { name, headline, about, experiences, profileUrl });
+
+  const data = { name, headline, about, experiences, profileUrl };
+  lastScrape = { profileUrl, data };
+  return data;
+}
+
 chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
 
   if (message.action === "getNameAndHeadline") {
@@ -408,44 +445,13 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
   if (message.action === "captureProfile") {
     console.log("ColdSend: Capturing profile");
     
-    waitFor("h1").then(async (h1) => {
-      if (!h1) {
+    scrapeProfile().then(data => {
+      if (!data) {
         sendResponse({ success: false, error: "No profile detected" });
         return;
       }
 
-      // Expand all "see more" buttons on the page first
-      console.log("ColdSend: Expanding all sections...");
-      
-      // we're running this 10 times just to make sure all sections are expanded, one time isn't enough for some reason
-      for (let i = 0; i < 10; i++) {
-        await expandAllSeeMore();
-      }
-
-      const name = getText("h1");
-      const headline = getText(".text-body-medium.break-words");
-      const about = getAboutSection();
-      const experiences = getExperiences();
-      const profileUrl = window.location.href;
-
-      console.log("Captured profile:", { name, headline, about, experiences, profileUrl });
-      
-      // Send to background script to generate email
-      // chrome.runtime.sendMessage({
-      //   action: 'generateEmail',
-      //   data: { name, headline, about, experiences }
-      // }, (response) => {
-      //   if (response?.success) {
-      //     console.log("Generated email:", response.email);
-      //   } else {
-      //     console.error("Email generation failed:", response?.error);
-      //   }
-      // });
-
-      sendResponse({ 
-        success: true, 
-        data: { name, headline, about, experiences, profileUrl } 
-      });
+      sendResponse({ success: true, data });
     }).catch(err => {
       console.error("Error in captureProfile:", err);
       sendResponse({ success: false });
@@ -454,4 +460,16 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
     return true;
   }
 
+  if (message.action === "pageReady") {
+    // Profile just loaded - scrape it and let the backend start generating
+    // before the user even opens the popup
+    scrapeProfile().then(data => {
+      if (!data) return;
+      chrome.runtime.sendMessage({ action: 'prefetchProfile', data });
+    }).catch(err => {
+      console.log("ColdSend: Prefetch scrape failed:", err);
+    });
+    return false;
+  }
+
 });
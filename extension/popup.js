@@ -2,6 +2,7 @@ console.log('popup loaded');
 
 let currentProfileData = null;
 let currentProfileUrl = null;
+let currentRecipientTimezone = null;
 
 
 // Formatting functions for contenteditable
@@ -71,6 +72,22 @@ function getPreferences() {
   };
 }
 
+// Save preferences so background prefetches use the same ones
+function savePreferences() {
+  chrome.storage.local.set({ coldsend_preferences: getPreferences() });
+}
+
+// Restore preferences saved from a previous popup session
+function loadPreferences() {
+  chrome.storage.local.get('coldsend_preferences', result => {
+    const preferences = result.coldsend_preferences;
+    if (!preferences) return;
+    document.getElementById('include-resume').checked = !!preferences.includeResume;
+    document.getElementById('include-coffee').checked = !!preferences.includeCoffeeChat;
+    document.getElementById('custom-instructions').value = preferences.customInstructions || '';
+  });
+}
+
 // Get storage key for current profile
 function getStorageKey(url) {
   // Extract the profile path (e.g., "/in/john-doe")
@@ -163,6 +180,7 @@ function generateEmail() {
           emailSubject.value = emailResponse.subject || '';
           emailSection.classList.remove('hidden');
           // Auto-fill recipient email if Apollo found it
+          currentRecipientTimezone = emailResponse.apolloTimezone || null;
           if (emailResponse.apolloEmail) {
             recipientEmail.value = emailResponse.apolloEmail;
             updateSendButtonState();
@@ -245,7 +263,8 @@ function regenerateEmail() {
     action: 'generateEmail',
     data: currentProfileData,
     preferences: getPreferences(),
-    linkedinUrl: currentProfileUrl
+    linkedinUrl: currentProfileUrl,
+    regenerate: true
   }, response => {
     regenerateBtn.disabled = false;
     regenerateBtn.innerHTML = `
@@ -264,6 +283,9 @@ function regenerateEmail() {
       emailSubject.value = response.subject || '';
       
       // Auto-fill recipient email if Apollo found it
+      if (response.apolloTimezone) {
+        currentRecipientTimezone = response.apolloTimezone;
+      }
       if (response.apolloEmail && !recipientEmail.value) {
         recipientEmail.value = response.apolloEmail;
         updateSendButtonState();
@@ -307,7 +329,9 @@ function sendEmail() {
     emailBody: emailContent,
     subject: emailSubject,
     includeResume: getPreferences().includeResume,
-    scheduleSend: scheduleSend
+    scheduleSend: scheduleSend,
+    recipientTimezone: currentRecipientTimezone,
+    linkedinUrl: currentProfileUrl
   }, response => {
     if (response?.success) {
       const successText = scheduleSend ? 'Scheduled!' : 'Sent!';
@@ -465,6 +489,10 @@ document.getElementById('recipient-email').addEventListener('input', () => {
   saveEmailData();
 });
 
+document.getElementById('include-resume').addEventListener('change', savePreferences);
+document.getElementById('include-coffee').addEventListener('change', savePreferences);
+document.getElementById('custom-instructions').addEventListener('input', savePreferences);
+
 
 //on being loaded it's pulling the profile headline and name to show on the popup and then it's also checking to see if an email's already been written for this profile
 document.addEventListener('DOMContentLoaded', () => {
@@ -475,6 +503,8 @@ document.addEventListener('DOMContentLoaded', () => {
   const emailSection = document.getElementById('email-section');
   const emailContent = document.getElementById('email-content');
 
+  loadPreferences();
+
   chrome.tabs.query({ active: true, currentWindow: true }, tabs => {
     const tab = tabs[0];
     currentProfileUrl = tab.url;
@@ -17,22 +17,9 @@ CREDENTIALS_FILE = "credentials.json"  # Path to your service account JSON
 
 raise Exception("This is a setup script. Please run it directly to set up your Google Sheet.") #remove line to run
 
-# Column definitions
-COLUMNS = [
-    "company_name",
-    "company_linkedin_url",
-    "job_title", 
-    "job_description",
-    "status",
-    "date_added",
-    "max_emails",
-    "profiles_found",
-    "emails_sent",
-    "notes"
-]
-
-# Valid status values (for reference)
-VALID_STATUSES = ["pending", "scraping", "emailing", "done", "paused"]
+# Column definitions and status values are shared with sheets_integ, which
+# reads the layout back from this header row
+from sheets_integ import COLUMNS, VALID_STATUSES
 
 
 def get_client():
@@ -58,27 +45,27 @@ def setup_sheet():
     worksheet.update("A1", [COLUMNS])
     
     # Format header row (bold)
-    worksheet.format("A1:J1", {
+    worksheet.format("1:1", {
         "textFormat": {"bold": True},
         "backgroundColor": {"red": 0.9, "green": 0.9, "blue": 0.9}
     })
     
     # Set column widths for readability
     column_widths = {
-        "A": 150,  # company_name
-        "B": 300,  # company_linkedin_url
-        "C": 200,  # job_title
-        "D": 400,  # job_description
-        "E": 100,  # status
-        "F": 120,  # date_added
-        "G": 100,  # max_emails
-        "H": 120,  # profiles_found
-        "I": 100,  # emails_sent
-        "J": 200,  # notes
+        "company_name": 150,
+        "company_linkedin_url": 300,
+        "job_title": 200,
+        "job_description": 400,
+        "status": 100,
+        "date_added": 120,
+        "max_emails": 100,
+        "profiles_found": 120,
+        "emails_sent": 100,
+        "notes": 200,
     }
     
     requests = []
-    for i, (col, width) in enumerate(column_widths.items()):
+    for i, name in enumerate(COLUMNS):
         requests.append({
             "updateDimensionProperties": {
                 "range": {
@@ -87,7 +74,7 @@ def setup_sheet():
                     "startIndex": i,
                     "endIndex": i + 1
                 },
-                "properties": {"pixelSize": width},
+                "properties": {"pixelSize": column_widths.get(name, 120)},
                 "fields": "pixelSize"
             }
         })
@@ -99,8 +86,8 @@ def setup_sheet():
                 "sheetId": worksheet.id,
                 "startRowIndex": 1,
                 "endRowIndex": 1000,
-                "startColumnIndex": 4,  # status column (E)
-                "endColumnIndex": 5
+                "startColumnIndex": COLUMNS.index("status"),
+                "endColumnIndex": COLUMNS.index("status") + 1
             },
             "rule": {
                 "condition": {
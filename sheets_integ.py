@@ -3,32 +3,51 @@ Google Sheets integration module for cold email automation.
 Provides functions to read pending jobs, update status, etc.
 """
 
-import gspread
-from google.oauth2.service_account import Credentials
+import re
+import time
 from datetime import datetime
-from typing import Optional
+from itertools import islice
+from operator import itemgetter
+from typing import Iterator, Optional
 from dataclasses import dataclass
 
 # Configuration
 SHEET_ID = "1qZaIABA_VQv1LWl9GBAoMDT0ii8FTB42b8ETl50DUKQ"
 CREDENTIALS_FILE = "credentials.json"
 
-# Column indices (0-based)
-COL = {
-    "company_name": 0,
-    "company_linkedin_url": 1,
-    "job_title": 2,
-    "job_description": 3,
-    "status": 4,
-    "date_added": 5,
-    "max_emails": 6,
-    "profiles_found": 7,
-    "emails_sent": 8,
-    "notes": 9
-}
-
-
-@dataclass
+# Default sheet layout (setup.py writes this header). At runtime the layout is
+# read from the sheet's own header row, so columns can be moved or added freely.
+COLUMNS = [
+    "company_name",
+    "company_linkedin_url",
+    "job_title",
+    "job_description",
+    "status",
+    "date_added",
+    "max_emails",
+    "profiles_found",
+    "emails_sent",
+    "notes"
+]
+
+# Default column indices (0-based)
+COL = {name: i for i, name in enumerate(COLUMNS)}
+
+# Valid status values. Rows that can't be parsed are moved to "quarantined".
+VALID_STATUSES = ["pending", "scraping", "emailing", "done", "paused", "quarantined"]
+QUARANTINE_STATUS = "quarantined"
+
+REQUIRED_COLUMNS = ("status",)
+INT_DEFAULTS = {"max_emails": 10, "profiles_found": 0, "emails_sent": 0}
+
+# Re-read the header row at most this often (seconds)
+SCHEMA_TTL = 300
+
+# Ranges per batch_get call (they go in the query string, so keep it bounded)
+MAX_RANGES_PER_FETCH = 100
+
+
+@dataclass(slots=True)
 class JobEntry:
     """Represents a row in the sheet."""
     row_number: int  # 1-indexed row in sheet
@@ -44,6 +63,59 @@ class JobEntry:
     notes: str
 
 
+# JobEntry fields that come from sheet columns, in order
+FIELDS = tuple(f for f in JobEntry.__slots__ if f != "row_number")
+
+
+def _col_letter(index: int) -> str:
+    """0-based column index -> sheet column letter (A, ..., Z, AA, ...)."""
+    letters = ""
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(ord('A') + rem) + letters
+    return letters
+
+
+def _normalize_header(name: str) -> str:
+    return name.strip().lower().replace(" ", "_")
+
+
+class Schema:
+    """Column layout built from the sheet's header row."""
+    __slots__ = ("index", "width", "_fields")
+
+    def __init__(self, header: list[str]):
+        self.index = {}
+        for i, name in enumerate(header):
+            name = _normalize_header(name)
+            if name and name not in self.index:
+                self.index[name] = i
+
+        missing = [c for c in REQUIRED_COLUMNS if c not in self.index]
+        if missing:
+            raise ValueError(f"Sheet header is missing required column(s): {', '.join(missing)}")
+
+        self.width = len(header)
+        # Pulls every field out of a row in one C-level call, in JobEntry field order.
+        # Columns the sheet doesn't have point at a padding slot past the end.
+        self._fields = itemgetter(*[self.index.get(f, self.width) for f in FIELDS])
+
+    def letter(self, name: str) -> str:
+        if name not in self.index:
+            raise ValueError(f"Sheet has no '{name}' column")
+        return _col_letter(self.index[name])
+
+    def last_letter(self) -> str:
+        return _col_letter(self.width - 1)
+
+    def fields(self, row: list) -> tuple:
+        """Field values for a row. Short rows are padded on a copy, never in place."""
+        if len(row) <= self.width:
+            row = row + [""] * (self.width + 1 - len(row))
+        return self._fields(row)
+
+
 _client = None
 _worksheet = None
 
@@ -52,6 +124,10 @@ def _get_worksheet():
     """Get cached worksheet connection."""
     global _client, _worksheet
     if _worksheet is None:
+        # Imported here so importing this module doesn't pay for gspread/google-auth
+        import gspread
+        from google.oauth2.service_account import Credentials
+
         scopes = [
             "https://www.googleapis.com/auth/spreadsheets",
             "https://www.googleapis.com/auth/drive"
@@ -63,88 +139,210 @@ def _get_worksheet():
     return _worksheet
 
 
-def _row_to_entry(row_number: int, row_data: list) -> JobEntry:
-    """Convert a row of data to a JobEntry object."""
-    # Pad row with empty strings if needed
-    while len(row_data) < 10:
-        row_data.append("")
-    
+_schema = None
+_schema_loaded_at = 0.0
+
+
+def _set_schema(header: list[str]) -> Schema:
+    global _schema, _schema_loaded_at
+    _schema = Schema(header)
+    _schema_loaded_at = time.monotonic()
+    return _schema
+
+
+def _get_schema(ws=None) -> Schema:
+    """Get the cached column layout, re-reading the header row after SCHEMA_TTL."""
+    if _schema is None or time.monotonic() - _schema_loaded_at > SCHEMA_TTL:
+        ws = ws or _get_worksheet()
+        return _set_schema(ws.row_values(1))
+    return _schema
+
+
+def reload_schema() -> Schema:
+    """Re-read the header row now (e.g. right after changing the sheet layout)."""
+    return _set_schema(_get_worksheet().row_values(1))
+
+
+def _to_int(name: str, value: str) -> int:
+    value = (value or "").strip()
+    if not value:
+        return INT_DEFAULTS[name]
+    try:
+        number = int(value)
+    except ValueError:
+        try:
+            as_float = float(value)
+        except ValueError:
+            raise ValueError(f"{name}={value!r} is not a number")
+        if not as_float.is_integer():
+            raise ValueError(f"{name}={value!r} is not a whole number")
+        number = int(as_float)
+    if number < 0:
+        raise ValueError(f"{name}={value!r} is negative")
+    return number
+
+
+def _row_to_entry(row_number: int, row_data: list, schema: Schema) -> JobEntry:
+    """
+    Convert a row of data to a JobEntry object. Doesn't modify row_data.
+    Raises ValueError if a numeric cell can't be coerced.
+    """
+    (company_name, company_linkedin_url, job_title, job_description, status,
+     date_added, max_emails, profiles_found, emails_sent, notes) = schema.fields(row_data)
+
     return JobEntry(
-        row_number=row_number,
-        company_name=row_data[COL["company_name"]] or "",
-        company_linkedin_url=row_data[COL["company_linkedin_url"]] or "",
-        job_title=row_data[COL["job_title"]] or "",
-        job_description=row_data[COL["job_description"]] or "",
-        status=row_data[COL["status"]] or "",
-        date_added=row_data[COL["date_added"]] or "",
-        max_emails=int(row_data[COL["max_emails"]] or 10),
-        profiles_found=int(row_data[COL["profiles_found"]] or 0),
-        emails_sent=int(row_data[COL["emails_sent"]] or 0),
-        notes=row_data[COL["notes"]] or ""
+        row_number,
+        company_name or "",
+        company_linkedin_url or "",
+        job_title or "",
+        job_description or "",
+        status or "",
+        date_added or "",
+        _to_int("max_emails", max_emails),
+        _to_int("profiles_found", profiles_found),
+        _to_int("emails_sent", emails_sent),
+        notes or ""
     )
 
 
+def _parse_rows(ws, numbered_rows, schema: Schema) -> Iterator[JobEntry]:
+    """
+    Validate and coerce (row number, row) pairs, yielding the good entries as
+    they're parsed. Bad rows are collected and quarantined in one write once
+    the rows run out (or the caller stops early).
+    """
+    bad = {}
+    status_col = schema.index["status"]
+    try:
+        for row_number, row in numbered_rows:
+            try:
+                entry = _row_to_entry(row_number, row, schema)
+            except ValueError as e:
+                # Already moved aside on an earlier pass - don't rewrite it every poll
+                if len(row) <= status_col or row[status_col] != QUARANTINE_STATUS:
+                    bad[row_number] = str(e)
+                continue
+            yield entry
+    finally:
+        _quarantine(ws, schema, bad)
+
+
+def _quarantine(ws, schema: Schema, bad: dict[int, str]):
+    """Move malformed rows out of the way so they don't stall polling."""
+    if not bad:
+        return
+    print(f"Quarantining {len(bad)} malformed row(s): {sorted(bad)}")
+    try:
+        status_letter = schema.letter("status")
+        ws.batch_update([
+            {"range": f"{status_letter}{row}", "values": [[QUARANTINE_STATUS]]} for row in sorted(bad)
+        ])
+        if "notes" in schema.index:
+            append_notes({row: [f"quarantined: {reason}"] for row, reason in bad.items()})
+    except Exception as e:
+        # Never let bookkeeping break the poll - the rows get retried next time
+        print(f"Failed to quarantine rows: {e}")
+
+
+def _row_ranges(row_numbers: list[int]) -> list[tuple[int, int]]:
+    """Collapse sorted row numbers into (first, last) runs of consecutive rows."""
+    runs = []
+    for row in row_numbers:
+        if runs and runs[-1][1] == row - 1:
+            runs[-1] = (runs[-1][0], row)
+        else:
+            runs.append((row, row))
+    return runs
+
+
+def _matching_rows(ws, schema: Schema, status: str) -> list[int]:
+    """Fetch only the status column and return the row numbers that match."""
+    statuses = ws.col_values(schema.index["status"] + 1)
+    return [i for i, value in enumerate(islice(statuses, 1, None), start=2) if value == status]
+
+
+def iter_jobs(status: Optional[str] = None) -> Iterator[JobEntry]:
+    """
+    Stream jobs from the sheet, optionally only those with a given status.
+
+    With a status, only the status column is downloaded first; the full rows
+    are then fetched with batch_get for the matches only. Batches start small
+    and grow, so taking the first match costs a single small fetch.
+    Rows with malformed cells are quarantined instead of raising.
+    """
+    ws = _get_worksheet()
+    if status is None:
+        all_rows = ws.get_all_values()
+        if not all_rows:
+            return
+        schema = _set_schema(all_rows[0])  # we have the header anyway
+        numbered = ((i, row) for i, row in enumerate(islice(all_rows, 1, None), start=2) if any(row))
+        yield from _parse_rows(ws, numbered, schema)
+        return
+
+    schema = _get_schema(ws)
+    runs = _row_ranges(_matching_rows(ws, schema, status))
+    first_col, last_col = _col_letter(0), schema.last_letter()
+    status_col = schema.index["status"]
+
+    batch_size = 1
+    while runs:
+        batch, runs = runs[:batch_size], runs[batch_size:]
+        ranges = [f"{first_col}{first}:{last_col}{last}" for first, last in batch]
+        # A row can change status between the column read and this fetch (another
+        # worker picked it up) - skip it rather than hand it out again
+        numbered = (
+            (first + offset, row)
+            for (first, _), values in zip(batch, ws.batch_get(ranges))
+            for offset, row in enumerate(values)
+            if len(row) > status_col and row[status_col] == status
+        )
+        yield from _parse_rows(ws, numbered, schema)
+        batch_size = min(batch_size * 4, MAX_RANGES_PER_FETCH)
+
+
 def get_pending_jobs() -> list[JobEntry]:
     """Get all jobs with status 'pending'."""
-    ws = _get_worksheet()
-    all_rows = ws.get_all_values()
-    
-    pending = []
-    for i, row in enumerate(all_rows[1:], start=2):  # Skip header, 1-indexed
-        if len(row) > COL["status"] and row[COL["status"]] == "pending":
-            pending.append(_row_to_entry(i, row))
-    
-    return pending
+    return list(iter_jobs("pending"))
 
 
 def get_jobs_by_status(status: str) -> list[JobEntry]:
     """Get all jobs with a specific status."""
-    ws = _get_worksheet()
-    all_rows = ws.get_all_values()
-    
-    jobs = []
-    for i, row in enumerate(all_rows[1:], start=2):
-        if len(row) > COL["status"] and row[COL["status"]] == status:
-            jobs.append(_row_to_entry(i, row))
-    
-    return jobs
+    return list(iter_jobs(status))
 
 
 def get_all_jobs() -> list[JobEntry]:
     """Get all jobs from the sheet."""
-    ws = _get_worksheet()
-    all_rows = ws.get_all_values()
-    
-    return [_row_to_entry(i, row) for i, row in enumerate(all_rows[1:], start=2) if any(row)]
+    return list(iter_jobs())
 
 
 def update_status(row_number: int, new_status: str):
     """Update the status of a job."""
     ws = _get_worksheet()
-    col_letter = chr(ord('A') + COL["status"])
+    col_letter = _get_schema(ws).letter("status")
     ws.update(f"{col_letter}{row_number}", [[new_status]])
 
 
 def update_profiles_found(row_number: int, count: int):
     """Update the profiles_found count for a job."""
     ws = _get_worksheet()
-    col_letter = chr(ord('A') + COL["profiles_found"])
+    col_letter = _get_schema(ws).letter("profiles_found")
     ws.update(f"{col_letter}{row_number}", [[count]])
 
 
 def update_emails_sent(row_number: int, count: int):
     """Update the emails_sent count for a job."""
     ws = _get_worksheet()
-    col_letter = chr(ord('A') + COL["emails_sent"])
+    col_letter = _get_schema(ws).letter("emails_sent")
     ws.update(f"{col_letter}{row_number}", [[count]])
 
 
 def increment_emails_sent(row_number: int):
     """Increment the emails_sent count by 1."""
     ws = _get_worksheet()
-    col_letter = chr(ord('A') + COL["emails_sent"])
+    col_letter = _get_schema(ws).letter("emails_sent")
     cell = ws.acell(f"{col_letter}{row_number}")
-    current = int(cell.value or 0)
+    current = _to_int("emails_sent", cell.value)
     ws.update(f"{col_letter}{row_number}", [[current + 1]])
 
 
@@ -158,28 +356,36 @@ def add_job(
 ) -> int:
     """Add a new job to the sheet. Returns the row number."""
     ws = _get_worksheet()
-    
-    new_row = [
-        company_name,
-        company_linkedin_url,
-        job_title,
-        job_description,
-        "pending",
-        datetime.now().strftime("%Y-%m-%d"),
-        max_emails,
-        0,  # profiles_found
-        0,  # emails_sent
-        notes
-    ]
-    
-    ws.append_row(new_row)
-    return len(ws.get_all_values())
+    schema = _get_schema(ws)
+
+    values = {
+        "company_name": company_name,
+        "company_linkedin_url": company_linkedin_url,
+        "job_title": job_title,
+        "job_description": job_description,
+        "status": "pending",
+        "date_added": datetime.now().strftime("%Y-%m-%d"),
+        "max_emails": max_emails,
+        "profiles_found": 0,
+        "emails_sent": 0,
+        "notes": notes
+    }
+    # Lay the row out to match the sheet's header
+    new_row = [""] * schema.width
+    for name, value in values.items():
+        if name in schema.index:
+            new_row[schema.index[name]] = value
+
+    result = ws.append_row(new_row)
+    # e.g. {"updates": {"updatedRange": "Sheet1!A12:J12", ...}}
+    updated_range = result["updates"]["updatedRange"]
+    return int(re.match(r"[A-Z]+(\d+)", updated_range.split("!")[-1]).group(1))
 
 
 def add_note(row_number: int, note: str, append: bool = True):
     """Add or update notes for a job."""
     ws = _get_worksheet()
-    col_letter = chr(ord('A') + COL["notes"])
+    col_letter = _get_schema(ws).letter("notes")
     
     if append:
         current = ws.acell(f"{col_letter}{row_number}").value or ""
@@ -189,11 +395,31 @@ def add_note(row_number: int, note: str, append: bool = True):
     ws.update(f"{col_letter}{row_number}", [[note]])
 
 
+def append_notes(notes: dict[int, list[str]]):
+    """
+    Append notes to many rows at once: one batch read of the current notes,
+    then one batch write. notes maps row number -> notes to append.
+    """
+    if not notes:
+        return
+    ws = _get_worksheet()
+    col_letter = _get_schema(ws).letter("notes")
+    rows = sorted(notes)
+
+    current = ws.batch_get([f"{col_letter}{row}" for row in rows])
+    updates = []
+    for row, existing in zip(rows, current):
+        parts = [existing[0][0]] if existing and existing[0] and existing[0][0] else []
+        parts.extend(notes[row])
+        updates.append({"range": f"{col_letter}{row}", "values": [["; ".join(parts)]]})
+
+    ws.batch_update(updates)
+
+
 # Convenience function for the polling service
 def get_next_pending_job() -> Optional[JobEntry]:
     """Get the oldest pending job (first one in sheet order)."""
-    pending = get_pending_jobs()
-    return pending[0] if pending else None
+    return next(iter_jobs("pending"), None)
 
 
 # if __name__ == "__main__":
@@ -0,0 +1,99 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+
+import delivery_tracker
+import suppression
+from delivery_tracker import DeliveryTracker, FakeGraph
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    index = suppression.SuppressionIndex(str(tmp_path / "suppression.db"))
+    monkeypatch.setattr(suppression, "_index", index)
+    return index
+
+
+@pytest.fixture
+def graph():
+    return FakeGraph()
+
+
+@pytest.fixture
+def notes():
+    return {}
+
+
+@pytest.fixture
+def tracker(tmp_path, graph, notes, index):
+    def write_notes(batch):
+        for row, row_notes in batch.items():
+            notes.setdefault(row, []).extend(row_notes)
+
+    tracker = DeliveryTracker(graph, path=str(tmp_path / "history.db"), sheet_writer=write_notes)
+    tracker.subscribe("https://example.com/graph/notifications")
+    return tracker
+
+
+def test_tagged_message_moves_to_sent(tracker, graph):
+    headers = {}
+    tracking_id = tracker.tag(headers, "jane@example.com", job_row=7)
+    assert headers[delivery_tracker.TRACKING_HEADER] == tracking_id
+    assert tracker.get_status(tracking_id)["status"] == "queued"
+
+    assert graph.send(tracker, tracking_id, "conv-1") == 1
+    assert tracker.get_status(tracking_id) == {"recipient": "jane@example.com", "jobRow": 7, "status": "sent"}
+
+
+def test_reply_in_conversation_marks_replied(tracker, graph, notes):
+    tracking_id = tracker.tag({}, "jane@example.com", job_row=7)
+    graph.send(tracker, tracking_id, "conv-1")
+
+    graph.reply(tracker, "conv-1", sender="jane@example.com")
+    assert tracker.get_status(tracking_id)["status"] == "replied"
+    assert notes == {7: ["replied: jane@example.com"]}
+
+
+def test_reply_in_other_conversation_is_ignored(tracker, graph, notes):
+    tracking_id = tracker.tag({}, "jane@example.com", job_row=7)
+    graph.send(tracker, tracking_id, "conv-1")
+
+    graph.reply(tracker, "conv-2")
+    assert tracker.get_status(tracking_id)["status"] == "sent"
+    assert notes == {}
+
+
+def test_bounce_marks_bounced_and_suppresses(tracker, graph, notes, index):
+    tracking_id = tracker.tag({}, "gone@example.com", job_row=3)
+    graph.send(tracker, tracking_id, "conv-9")
+
+    graph.bounce(tracker, "conv-9")
+    assert tracker.get_status(tracking_id)["status"] == "bounced"
+    assert notes == {3: ["bounced: gone@example.com"]}
+    assert index.check(email="gone@example.com")
+
+
+def test_bad_client_state_is_ignored(tracker, graph):
+    tracking_id = tracker.tag({}, "jane@example.com")
+
+    assert graph.send(tracker, tracking_id, "conv-1", client_state="forged") == 0
+    assert tracker.get_status(tracking_id)["status"] == "queued"
+
+
+def test_subscriptions_survive_restart(tmp_path, tracker, graph, index):
+    tracking_id = tracker.tag({}, "jane@example.com")
+
+    # A new process: same database, fresh clientState for new subscriptions
+    restarted = DeliveryTracker(graph, path=str(tmp_path / "history.db"), sheet_writer=lambda notes: None)
+    assert restarted.subscriptions.keys() == tracker.subscriptions.keys()
+    graph.send(restarted, tracking_id, "conv-1")
+    assert restarted.get_status(tracking_id)["status"] == "sent"
+
+
+def test_mark_failed(tracker):
+    tracking_id = tracker.tag({}, "jane@example.com")
+    tracker.mark_failed(tracking_id)
+    assert tracker.get_status(tracking_id)["status"] == "failed"